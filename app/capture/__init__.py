@@ -13,6 +13,7 @@ from .recorder import (
     RecordedAction,
     RecordingSession,
     ActionType,
+    SelectorType,
     get_recorder,
 )
 from .generator import (
@@ -35,6 +36,7 @@ __all__ = [
     "RecordedAction",
     "RecordingSession",
     "ActionType",
+    "SelectorType",
     "get_recorder",
     "SkillGenerator",
     "GeneratedSkill",
@@ -0,0 +1,41 @@
+"""
+JSON 读写辅助
+
+知识库索引与向量存储共用；安装了 orjson 时走 C 实现，缺失时回退到标准库 json
+"""
+
+import json
+from datetime import datetime
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，缺失时回退到标准库 json
+    orjson = None
+
+
+def _json_default(obj: Any) -> Any:
+    """标准库 json 的兜底序列化（orjson 原生支持 datetime）"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any, pretty: bool = True) -> bytes:
+    """序列化为 JSON 字节串（pretty=False 输出紧凑单行）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else None)
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        indent=2 if pretty else None,
+        separators=None if pretty else (",", ":"),
+        default=_json_default,
+    ).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """反序列化 JSON 字节串"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,940 @@
+"""
+向量存储实现
+
+由 vector_store 在首次访问时导入，NumPy（以及可选的 numba）的导入开销随之推迟
+"""
+
+import os
+import mmap
+import atexit
+import hashlib
+import weakref
+import threading
+import numpy as np
+from collections import OrderedDict
+from importlib.util import find_spec
+from pathlib import Path
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Any, Tuple
+
+from ._jsonio import dumps, loads
+
+try:
+    import numba
+except ImportError:  # 可选依赖，缺失时检索打分走 NumPy（BLAS）实现
+    numba = None
+
+
+@dataclass(slots=True)
+class VectorEntry:
+    """向量条目"""
+    entry_id: str
+    content: str
+    embedding: np.ndarray
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+@dataclass(slots=True)
+class SearchMatch:
+    """搜索匹配结果"""
+    entry_id: str
+    content: str
+    score: float  # 相似度分数 0-1
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+# n-gram 多项式哈希的乘数与混合常数（64 位无符号回绕运算）
+_NGRAM_PRIME = 1000003
+_NGRAM_MIX = 0x9E3779B97F4A7C15
+
+
+if numba is not None:
+    # 只放开重结合/FMA 以便向量化；完整的 fastmath 假设不存在 inf/nan，比较可能被错误化简
+    @numba.njit(parallel=True, fastmath={"reassoc", "contract"}, cache=True)
+    def _search_kernel(query, vectors, alive, threshold):
+        """打分 + 墓碑/阈值过滤融合在一次遍历中，返回通过阈值的 (行号, 分数)"""
+        n, d = vectors.shape
+        scores = np.empty(n, dtype=np.float32)
+        keep = np.zeros(n, dtype=np.bool_)
+        for i in numba.prange(n):
+            if not alive[i]:
+                continue
+            s = np.float32(0.0)
+            for j in range(d):
+                s += vectors[i, j] * query[j]
+            scores[i] = s
+            keep[i] = s >= threshold
+        indices = np.flatnonzero(keep)
+        return indices, scores[indices]
+else:
+    def _search_kernel(query, vectors, alive, threshold):
+        """打分 + 墓碑/阈值过滤，返回通过阈值的 (行号, 分数)"""
+        scores = vectors @ query
+        indices = np.flatnonzero(alive & (scores >= threshold))
+        return indices, scores[indices]
+
+
+class EmbeddingProvider:
+    """
+    Embedding 提供者抽象
+
+    支持多种 Embedding 后端
+    """
+
+    # 本地 embedding 维度与关键词表
+    LOCAL_DIM = 256
+    LOCAL_KEYWORDS = (
+        "file", "read", "write", "create", "delete", "list",
+        "code", "test", "run", "build", "deploy", "git",
+        "commit", "push", "pull", "merge", "branch",
+        "search", "find", "grep", "replace", "edit",
+        "format", "lint", "check", "validate", "analyze",
+        "generate", "summarize", "explain", "document",
+        "api", "request", "response", "data", "json",
+        "error", "debug", "fix", "bug", "issue",
+        "product", "price", "order", "customer", "inventory",
+        "pos", "app", "web", "mobile", "backend",
+    )
+
+    # n-gram 哈希特征所在区间 [offset, offset + buckets)
+    _NGRAM_OFFSET = LOCAL_DIM // 2 + 10
+    _NGRAM_BUCKETS = LOCAL_DIM // 4
+
+    # 远程后端 → SDK 模块名
+    _BACKEND_MODULES = {"voyage": "voyageai", "openai": "openai"}
+
+    # embedding 缓存容量（条）
+    CACHE_SIZE = 4096
+
+    def __init__(self, backend: str = "auto"):
+        self.backend = backend
+        self._client = None
+        self._init_backend()
+
+        # 文本摘要 → embedding 的 LRU 缓存（缓存的数组只读）
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_dirty = False
+        self._cache_lock = threading.Lock()
+
+    def _init_backend(self):
+        """初始化后端"""
+        if self.backend == "auto":
+            # 按优先级尝试
+            if os.environ.get("VOYAGE_API_KEY"):
+                self.backend = "voyage"
+            elif os.environ.get("OPENAI_API_KEY"):
+                self.backend = "openai"
+            else:
+                self.backend = "local"
+
+        # 只确认 SDK 是否可用，真正的导入与客户端创建推迟到首次调用（见 _ensure_client）
+        if self.backend in self._BACKEND_MODULES and find_spec(self._BACKEND_MODULES[self.backend]) is None:
+            self.backend = "local"
+
+    def _ensure_client(self):
+        """首次需要远程 embedding 时才导入 SDK 并创建客户端"""
+        if self._client is not None:
+            return
+
+        if self.backend == "voyage":
+            import voyageai
+            self._client = voyageai.Client()
+
+        elif self.backend == "openai":
+            import openai
+            self._client = openai.OpenAI()
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        """生成 embedding（命中缓存的文本不再计算；远程后端同时省去一次 API 调用）"""
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        pending: Dict[bytes, List[int]] = {}
+
+        with self._cache_lock:
+            for i, text in enumerate(texts):
+                key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    results[i] = cached
+                else:
+                    pending.setdefault(key, []).append(i)
+
+        if pending:
+            # 同一批次内的重复文本只计算一次
+            misses = [texts[indices[0]] for indices in pending.values()]
+            for (key, indices), vector in zip(pending.items(), self._embed_uncached(misses)):
+                vector.flags.writeable = False
+                for i in indices:
+                    results[i] = vector
+                self._remember(key, vector)
+
+        return results
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        """写入缓存，超出容量时淘汰最久未用的条目"""
+        with self._cache_lock:
+            self._cache[key] = vector
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+            self._cache_dirty = True
+
+    def load_cache(self, cache_file: Path):
+        """从 .npz 文件恢复缓存（后端不一致或文件损坏时忽略）"""
+        try:
+            with np.load(cache_file) as data:
+                if str(data["backend"]) != self.backend:
+                    return
+                for key, vector in zip(data["keys"], data["vectors"]):
+                    vector.flags.writeable = False
+                    self._cache[key.tobytes()] = vector
+        except Exception:
+            return
+
+    def save_cache(self, cache_file: Path):
+        """把缓存写入 .npz 文件（无新增条目时跳过）"""
+        with self._cache_lock:
+            if not self._cache_dirty or not self._cache:
+                return
+            keys = b"".join(self._cache.keys())
+            vectors = list(self._cache.values())
+            self._cache_dirty = False
+
+        tmp_file = cache_file.with_suffix(".tmp.npz")
+        np.savez(
+            tmp_file,
+            backend=np.array(self.backend),
+            keys=np.frombuffer(keys, dtype=np.uint8).reshape(-1, 16),
+            vectors=np.vstack(vectors),
+        )
+        os.replace(tmp_file, cache_file)
+
+    def _embed_uncached(self, texts: List[str]) -> List[np.ndarray]:
+        """调用后端生成 embedding"""
+        self._ensure_client()
+
+        if self.backend == "voyage":
+            result = self._client.embed(texts, model="voyage-2")
+            return [np.array(e) for e in result.embeddings]
+
+        elif self.backend == "openai":
+            result = self._client.embeddings.create(
+                input=texts,
+                model="text-embedding-3-small"
+            )
+            return [np.array(e.embedding) for e in result.data]
+
+        else:
+            # 本地简单 embedding
+            return list(self._local_embed_batch(texts))
+
+    def _local_embed_batch(self, texts: List[str]) -> np.ndarray:
+        """本地简单 embedding：整批文本一次构建 (B, D) 特征矩阵"""
+        dim = self.LOCAL_DIM
+        lowered = [text.lower() for text in texts]
+        batch = len(lowered)
+        vectors = np.zeros((batch, dim))
+        lengths = np.fromiter(map(len, lowered), dtype=np.intp, count=batch)
+
+        # 关键词特征（逐关键词计数在 C 中完成）
+        keywords = self.LOCAL_KEYWORDS[:dim // 2]
+        counts = np.array(
+            [[text.count(kw) for kw in keywords] for text in lowered],
+            dtype=np.float64,
+        ).reshape(batch, len(keywords))
+        vectors[:, :len(keywords)] = counts / (lengths + 1)[:, None]
+
+        # 统计特征
+        words = [text.split() for text in lowered]
+        n_words = np.fromiter(map(len, words), dtype=np.float64, count=batch)
+        n_unique = np.fromiter((len(set(w)) for w in words), dtype=np.float64, count=batch)
+        vectors[:, dim // 2] = n_words / 100
+        vectors[:, dim // 2 + 1] = lengths / 500
+        vectors[:, dim // 2 + 2] = n_unique / (n_words + 1)
+
+        # 字符 n-gram 哈希特征：整批码点拼接后一次计算，丢弃跨越文本边界的窗口
+        offset, buckets = self._NGRAM_OFFSET, self._NGRAM_BUCKETS
+        codes = np.frombuffer(
+            "".join(lowered).encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        ).astype(np.uint64)
+        owner = np.repeat(np.arange(batch), lengths)
+        for n in (2, 3):
+            m = len(codes) - n + 1
+            if m <= 0:
+                continue
+            h = codes[:m].copy()
+            for k in range(1, n):
+                h = h * _NGRAM_PRIME + codes[k:k + m]
+            valid = owner[:m] == owner[n - 1:]
+            idx = (((h[valid] * _NGRAM_MIX) >> 32) % buckets).astype(np.intp)
+            flat = owner[:m][valid] * buckets + idx
+            vectors[:, offset:offset + buckets] += np.bincount(
+                flat, minlength=batch * buckets
+            ).reshape(batch, buckets)
+
+        # 归一化（零向量保持为零）
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+
+        return vectors
+
+
+# 退出时需要合并日志的向量存储实例（弱引用，不阻止实例被回收）
+_open_stores: "weakref.WeakSet[VectorStore]" = weakref.WeakSet()
+
+
+@atexit.register
+def _compact_on_exit():
+    """退出时把各实例未合并的日志写回（目录已被删除的实例跳过）"""
+    for instance in list(_open_stores):
+        if instance.storage_path.is_dir():
+            instance.compact()
+
+
+class VectorStore:
+    """
+    向量存储
+
+    功能：
+    - 存储文本和向量
+    - 语义相似度搜索
+    - 持久化到文件
+
+    条目的增删以操作日志（index.wal，每行一条 JSON）追加写入，
+    由 compact() 或下一次完整保存合并进 index.json。
+
+    向量保存在按倍数扩容的预分配缓冲区中，新增行原地写入内存映射的
+    vectors.npy；删除只标记墓碑，完整保存时再压缩行号。
+
+    压缩后的矩阵先写入 vectors.<代数>.pending.npy，index.json 原子替换后
+    再替换 vectors.npy；两次替换之间崩溃时，加载阶段按索引中的代数补完替换。
+    操作日志首行记录其基于的索引代数，代数落后的日志已合并进索引，不再回放。
+    """
+
+    # 操作日志累计条数达到该值时自动压缩
+    WAL_COMPACT_THRESHOLD = 1000
+
+    # 向量缓冲区初始容量（行）
+    INITIAL_CAPACITY = 64
+
+    # 向量以 L2 归一化后的 float32 存储，检索时余弦相似度即一次矩阵-向量乘
+    DTYPE = np.float32
+
+    def __init__(
+        self,
+        storage_path: str = None,
+        embedding_backend: str = "auto",
+        legacy_id_hash: bool = False
+    ):
+        self.storage_path = Path(storage_path) if storage_path else Path("data/vectors")
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.storage_path / "index.json"
+        self.wal_file = self.storage_path / "index.wal"
+        self.vectors_file = self.storage_path / "vectors.npy"
+
+        self.embed_cache_file = self.storage_path / "embed_cache.npz"
+
+        self._embedding_provider = EmbeddingProvider(embedding_backend)
+        self._embedding_provider.load_cache(self.embed_cache_file)
+        self._entries: Dict[str, VectorEntry] = {}
+
+        # 自动 ID 使用 blake2b；legacy_id_hash=True 时沿用旧版 MD5 前缀，保持已有 ID 稳定
+        self._legacy_id_hash = legacy_id_hash
+
+        # 向量缓冲区：(capacity, D)，前 _n 行有效（含墓碑行）
+        self._vecs_buf: Optional[np.ndarray] = None
+        self._alive: Optional[np.ndarray] = None   # 行存活位图
+        self._n = 0
+        self._entry_ids: List[Optional[str]] = []  # 行号 → 条目 ID（墓碑为 None）
+        self._rows: Dict[str, int] = {}            # 条目 ID → 行号
+
+        # vectors.npy 的内存映射（首次写入时打开）
+        self._disk: Optional[np.ndarray] = None
+
+        # 保护条目、向量缓冲区与文件写入的可重入锁
+        self._lock = threading.RLock()
+
+        # 操作日志（追加写句柄在首次写入时打开）
+        self._wal = None
+        self._wal_count = 0
+
+        # 上次写入的索引内容摘要（内容未变时跳过重写）
+        self._last_saved_digest = b""
+
+        # 索引代数：每次重写 index.json 加一，用于识别待替换的向量文件与过期日志
+        self._generation = 0
+
+        # 加载已有数据
+        self._load()
+
+        # 退出时把未合并的操作写回 index.json
+        _open_stores.add(self)
+
+    @property
+    def _vectors(self) -> Optional[np.ndarray]:
+        """有效行视图（不复制）"""
+        if self._vecs_buf is None:
+            return None
+        return self._vecs_buf[:self._n]
+
+    def _load(self):
+        """加载数据"""
+        try:
+            n = 0
+            if self.index_file.exists():
+                with open(self.index_file, 'rb') as f:
+                    data = loads(f.read())
+
+                entries = data.get("entries", [])
+                for row, item in enumerate(entries):
+                    self._load_entry(item["entry_id"], item["content"], item.get("metadata", {}), item.get("row", row))
+                n = data.get("rows", len(entries))
+                self._generation = data.get("generation", 0)
+
+            self._finish_pending_vectors()
+            n = max(n, self._replay_wal())
+
+            if not self.vectors_file.exists():
+                # 向量文件缺失：条目保留但不可检索
+                self._rows.clear()
+            elif self._rows:
+                # 写时复制映射：启动时不读入整个矩阵，按需分页；原地修改只落在私有页，
+                # 落盘仍由 _write_rows 负责
+                self._vecs_buf = np.load(self.vectors_file, mmap_mode='c')
+                if self._vecs_buf.dtype != self.DTYPE:
+                    # 旧格式（未归一化的 float64）：一次性转换
+                    self._vecs_buf = self._normalize(self._vecs_buf)
+                else:
+                    self._advise_sequential(self._vecs_buf)
+                self._n = n
+                self._alive = np.zeros(len(self._vecs_buf), dtype=bool)
+                self._entry_ids = [None] * n
+                for entry_id, row in self._rows.items():
+                    self._alive[row] = True
+                    self._entry_ids[row] = entry_id
+
+        except Exception as e:
+            print(f"Warning: Failed to load vector store: {e}")
+
+    @staticmethod
+    def _advise_sequential(array: np.ndarray):
+        """提示内核顺序预读（检索时整块扫描所有行）"""
+        backing = getattr(array, "_mmap", None)
+        if backing is not None and hasattr(mmap, "MADV_SEQUENTIAL"):
+            backing.madvise(mmap.MADV_SEQUENTIAL)
+
+    def _load_entry(self, entry_id: str, content: str, metadata: Dict[str, Any], row: int):
+        """从索引或日志恢复条目（向量随矩阵整体加载）"""
+        self._entries[entry_id] = VectorEntry(
+            entry_id=entry_id,
+            content=content,
+            embedding=np.array([]),  # 延迟加载
+            metadata=metadata,
+        )
+        self._rows[entry_id] = row
+
+    def _pending_vectors_file(self, generation: int) -> Path:
+        """第 generation 代索引对应的待替换向量文件"""
+        return self.storage_path / f"vectors.{generation}.pending.npy"
+
+    def _finish_pending_vectors(self):
+        """补完上次保存中断的向量文件替换；不属于当前索引的待替换文件直接丢弃"""
+        pending = self._pending_vectors_file(self._generation)
+        if pending.exists():
+            os.replace(pending, self.vectors_file)
+        for stale in self.storage_path.glob("vectors.*.pending.npy"):
+            stale.unlink(missing_ok=True)
+
+    def _replay_wal(self) -> int:
+        """回放操作日志，返回日志中出现过的行数上界"""
+        try:
+            with open(self.wal_file, 'rb') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+
+        n = 0
+        for i, line in enumerate(lines):
+            try:
+                record = loads(line)
+            except ValueError:
+                self._wal_count += 1
+                continue  # 崩溃时可能留下不完整的最后一行
+
+            if record["op"] == "base":
+                if i == 0 and record["generation"] != self._generation:
+                    # 日志早于当前索引（保存在清空日志前中断），其中的操作已在索引里
+                    self._wal_count = 1
+                    self._reset_wal()
+                    return 0
+                continue
+
+            self._wal_count += 1
+            entry_id = record["entry_id"]
+            if record["op"] == "add":
+                self._load_entry(entry_id, record["content"], record["metadata"], record["row"])
+                n = max(n, record["row"] + 1)
+            elif record["op"] == "delete":
+                self._entries.pop(entry_id, None)
+                self._rows.pop(entry_id, None)
+
+        return n
+
+    def _append_wal(self, records: List[Dict[str, Any]]):
+        """追加操作记录，达到阈值时压缩"""
+        if self._wal is None:
+            self._wal = open(self.wal_file, 'ab')
+            if self._wal_count == 0:
+                records = [{"op": "base", "generation": self._generation}] + records
+        self._wal.write(b"".join(dumps(r, pretty=False) + b"\n" for r in records))
+        self._wal.flush()
+
+        self._wal_count += len(records)
+        if self._wal_count >= self.WAL_COMPACT_THRESHOLD:
+            self.compact()
+
+    def _reset_wal(self):
+        """清空操作日志"""
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+        if self._wal_count:
+            tmp_file = self.wal_file.with_suffix(".wal.tmp")
+            tmp_file.write_bytes(b"")
+            os.replace(tmp_file, self.wal_file)
+            self._wal_count = 0
+
+    def compact(self):
+        """将本实例写入的操作日志合并进 index.json，并持久化 embedding 缓存"""
+        with self._lock:
+            if self._wal is not None:
+                self._save()
+            self._embedding_provider.save_cache(self.embed_cache_file)
+
+    @classmethod
+    def _normalize(cls, vectors: np.ndarray) -> np.ndarray:
+        """按行 L2 归一化为连续的 float32（零向量保持为零）"""
+        vectors = np.array(vectors, dtype=cls.DTYPE, ndmin=2, order="C")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-10
+        return vectors
+
+    def _reserve(self, extra: int, dim: int):
+        """确保缓冲区还能容纳 extra 行，不足时按 2 倍扩容"""
+        if self._vecs_buf is None:
+            capacity = max(self.INITIAL_CAPACITY, extra)
+            self._vecs_buf = np.empty((capacity, dim), dtype=self.DTYPE)
+            self._alive = np.zeros(capacity, dtype=bool)
+            return
+
+        capacity = len(self._vecs_buf)
+        if self._n + extra <= capacity:
+            return
+
+        capacity = max(capacity * 2, self._n + extra)
+        vecs_buf = np.empty((capacity, self._vecs_buf.shape[1]), dtype=self._vecs_buf.dtype)
+        vecs_buf[:self._n] = self._vecs_buf[:self._n]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._n] = self._alive[:self._n]
+        self._vecs_buf, self._alive = vecs_buf, alive
+
+    def _put(self, entry_ids: List[str], embeddings: List[np.ndarray]) -> List[int]:
+        """写入向量：已有条目原地覆盖，新条目追加到末尾；返回写入的行号"""
+        vectors = self._normalize(embeddings)
+        self._reserve(len(entry_ids), vectors.shape[1])
+
+        rows = []
+        for entry_id, embedding in zip(entry_ids, vectors):
+            row = self._rows.get(entry_id)
+            if row is None:
+                row = self._n
+                self._n += 1
+                self._rows[entry_id] = row
+                self._entry_ids.append(entry_id)
+                self._alive[row] = True
+            self._vecs_buf[row] = embedding
+            rows.append(row)
+
+        self._write_rows(rows)
+        return rows
+
+    def _write_rows(self, rows):
+        """把缓冲区中的指定行写入 vectors.npy（容量变化时按新容量重建文件）"""
+        if self._disk is None and self.vectors_file.exists():
+            disk = np.lib.format.open_memmap(self.vectors_file, mode='r+')
+            if disk.shape == self._vecs_buf.shape and disk.dtype == self._vecs_buf.dtype:
+                self._disk = disk
+
+        if self._disk is None or self._disk.shape != self._vecs_buf.shape:
+            self._disk = None
+            self._disk = np.lib.format.open_memmap(
+                self.vectors_file,
+                mode='w+',
+                dtype=self._vecs_buf.dtype,
+                shape=self._vecs_buf.shape,
+            )
+            rows = slice(0, self._n)
+
+        self._disk[rows] = self._vecs_buf[rows]
+        self._disk.flush()
+
+    def _compact_rows(self) -> bool:
+        """去掉墓碑行，使行号连续（只改内存，落盘由 _save 负责）；返回行号是否变化"""
+        if self._vecs_buf is None or len(self._rows) == self._n:
+            return False
+
+        live = np.flatnonzero(self._alive[:self._n])
+        self._entry_ids = [self._entry_ids[row] for row in live]
+        self._rows = {entry_id: row for row, entry_id in enumerate(self._entry_ids)}
+        self._vecs_buf[:len(live)] = self._vecs_buf[live]
+        self._alive[:] = False
+        self._alive[:len(live)] = True
+        self._n = len(live)
+        return True
+
+    def _write_pending_vectors(self, pending: Path):
+        """把压缩后的缓冲区完整写入待替换文件（不触碰 vectors.npy）"""
+        disk = np.lib.format.open_memmap(
+            pending,
+            mode='w+',
+            dtype=self._vecs_buf.dtype,
+            shape=self._vecs_buf.shape,
+        )
+        disk[:self._n] = self._vecs_buf[:self._n]
+        disk.flush()
+        del disk
+
+    def _save(self):
+        """保存完整快照（索引 + 向量），并清空操作日志"""
+        with self._lock:
+            compacted = self._compact_rows()
+
+            # 保存索引（按行号顺序；先写临时文件再原子替换，内容未变时不重写）
+            entries = [
+                {
+                    "entry_id": entry_id,
+                    "row": row,
+                    "content": self._entries[entry_id].content,
+                    "metadata": self._entries[entry_id].metadata,
+                }
+                for row, entry_id in enumerate(self._entry_ids)
+            ]
+            digest = hashlib.blake2b(dumps([self._n, entries], pretty=False), digest_size=16).digest()
+            if digest != self._last_saved_digest:
+                generation = self._generation + 1
+                pending = None
+                if compacted and self._n:
+                    pending = self._pending_vectors_file(generation)
+                    self._write_pending_vectors(pending)
+
+                data = {
+                    "updated_at": datetime.utcnow(),
+                    "generation": generation,
+                    "rows": self._n,
+                    "entries": entries
+                }
+                tmp_file = self.index_file.with_suffix(".json.tmp")
+                tmp_file.write_bytes(dumps(data))
+                os.replace(tmp_file, self.index_file)
+                self._generation = generation
+                self._last_saved_digest = digest
+
+                if pending is not None:
+                    self._disk = None
+                    os.replace(pending, self.vectors_file)
+
+            # 快照已包含全部操作，清空日志
+            self._reset_wal()
+            self._embedding_provider.save_cache(self.embed_cache_file)
+
+    @staticmethod
+    def _add_record(entry: VectorEntry, row: int) -> Dict[str, Any]:
+        """条目新增/更新的日志记录"""
+        return {"op": "add", "entry_id": entry.entry_id, "row": row, "content": entry.content, "metadata": entry.metadata}
+
+    def _make_id(self, content: str) -> str:
+        """由内容生成 12 位十六进制条目 ID"""
+        if self._legacy_id_hash:
+            return hashlib.md5(content.encode()).hexdigest()[:12]
+        return hashlib.blake2b(content.encode(), digest_size=6).hexdigest()
+
+    def add(
+        self,
+        content: str,
+        entry_id: str = None,
+        metadata: Dict[str, Any] = None
+    ) -> str:
+        """
+        添加条目
+
+        Args:
+            content: 文本内容
+            entry_id: 条目 ID（可选，自动生成）
+            metadata: 元数据
+
+        Returns:
+            条目 ID
+        """
+        # 生成 ID
+        if not entry_id:
+            entry_id = self._make_id(content)
+
+        # 生成 embedding
+        embeddings = self._embedding_provider.embed([content])
+        embedding = embeddings[0]
+
+        # 创建条目
+        entry = VectorEntry(
+            entry_id=entry_id,
+            content=content,
+            embedding=embedding,
+            metadata=metadata or {},
+        )
+
+        with self._lock:
+            # 更新内存与向量缓冲区（已有条目原地覆盖）
+            self._entries[entry_id] = entry
+            row, = self._put([entry_id], [embedding])
+
+            # 保存：追加一条日志，向量行已原地写入
+            self._append_wal([self._add_record(entry, row)])
+
+        return entry_id
+
+    def add_batch(
+        self,
+        items: List[Tuple[str, str, Dict[str, Any]]]  # [(content, entry_id, metadata), ...]
+    ) -> List[str]:
+        """批量添加"""
+        if not items:
+            return []
+
+        contents = [item[0] for item in items]
+
+        # 批量生成 embedding
+        embeddings = self._embedding_provider.embed(contents)
+
+        entries = [
+            VectorEntry(
+                entry_id=entry_id or self._make_id(content),
+                content=content,
+                embedding=embeddings[i],
+                metadata=metadata or {},
+            )
+            for i, (content, entry_id, metadata) in enumerate(items)
+        ]
+        entry_ids = [entry.entry_id for entry in entries]
+
+        with self._lock:
+            for entry in entries:
+                self._entries[entry.entry_id] = entry
+
+            # 一次写入所有向量行
+            rows = self._put(entry_ids, embeddings)
+            self._append_wal([
+                self._add_record(self._entries[entry_id], row)
+                for entry_id, row in zip(entry_ids, rows)
+            ])
+
+        return entry_ids
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        threshold: float = 0.3
+    ) -> List[SearchMatch]:
+        """
+        语义搜索
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+            threshold: 相似度阈值
+
+        Returns:
+            匹配结果列表
+        """
+        if self._vectors is None or len(self._entries) == 0:
+            return []
+
+        # 生成查询 embedding
+        query_embedding = self._embedding_provider.embed([query])[0]
+
+        with self._lock:
+            if self._vecs_buf is None:
+                return []
+
+            # 计算余弦相似度，并剔除墓碑行与低于阈值的行
+            alive = self._alive[:self._n]
+            query_vec = self._normalize(query_embedding)[0]
+            candidates, scores = _search_kernel(query_vec, np.asarray(self._vectors), alive, threshold)
+
+            # 只对 top_k 个候选部分排序
+            if top_k <= 0:
+                order = np.arange(0)
+            elif top_k < len(candidates):
+                order = np.argpartition(scores, -top_k)[-top_k:]
+            else:
+                order = np.arange(len(candidates))
+            order = order[np.argsort(-scores[order], kind="stable")]
+            results = []
+
+            for idx, score in zip(candidates[order], scores[order]):
+                entry_id = self._entry_ids[idx]
+                entry = self._entries.get(entry_id)
+
+                if entry:
+                    results.append(SearchMatch(
+                        entry_id=entry_id,
+                        content=entry.content,
+                        score=float(score),
+                        metadata=entry.metadata,
+                    ))
+
+            return results
+
+    def delete(self, entry_id: str) -> bool:
+        """删除条目"""
+        with self._lock:
+            if entry_id not in self._entries:
+                return False
+
+            del self._entries[entry_id]
+
+            # 只标记墓碑，不移动其他行
+            row = self._rows.pop(entry_id, None)
+            if row is not None:
+                self._entry_ids[row] = None
+                self._alive[row] = False
+            self._append_wal([{"op": "delete", "entry_id": entry_id}])
+
+            # 墓碑超过一半时压缩
+            if (self._n - len(self._rows)) * 2 > self._n:
+                self._save()
+
+            return True
+
+    def get(self, entry_id: str) -> Optional[VectorEntry]:
+        """获取条目"""
+        return self._entries.get(entry_id)
+
+    def count(self) -> int:
+        """获取条目数量"""
+        return len(self._entries)
+
+    def clear(self):
+        """清空存储"""
+        with self._lock:
+            self._entries.clear()
+            self._entry_ids.clear()
+            self._rows.clear()
+            self._vecs_buf = None
+            self._alive = None
+            self._n = 0
+            self._disk = None
+            self.vectors_file.unlink(missing_ok=True)
+            self._save()
+
+
+class SkillVectorStore(VectorStore):
+    """
+    Skill 向量存储
+
+    专门用于 Skill 的向量化存储和 RAG 检索
+    """
+
+    def add_skill(
+        self,
+        skill_id: str,
+        name: str,
+        description: str,
+        content: str,
+        category: str = None,
+        tags: List[str] = None
+    ) -> str:
+        """
+        添加 Skill 到向量存储
+
+        Args:
+            skill_id: Skill ID
+            name: 名称
+            description: 描述
+            content: 完整内容
+            category: 分类
+            tags: 标签
+
+        Returns:
+            条目 ID
+        """
+        # 构建索引文本（组合名称、描述、标签）
+        index_text = f"{name}\n{description}"
+        if tags:
+            index_text += f"\n{' '.join(tags)}"
+
+        metadata = {
+            "skill_id": skill_id,
+            "name": name,
+            "description": description,
+            "category": category,
+            "tags": tags or [],
+            "type": "skill",
+        }
+
+        return self.add(index_text, entry_id=skill_id, metadata=metadata)
+
+    def search_skills(
+        self,
+        query: str,
+        top_k: int = 5,
+        category: str = None
+    ) -> List[SearchMatch]:
+        """
+        搜索相关 Skill
+
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+            category: 过滤分类
+
+        Returns:
+            匹配的 Skill 列表
+        """
+        results = self.search(query, top_k=top_k * 2, threshold=0.2)
+
+        # 过滤非 Skill 条目
+        results = [r for r in results if r.metadata.get("type") == "skill"]
+
+        # 按分类过滤
+        if category:
+            results = [r for r in results if r.metadata.get("category") == category]
+
+        return results[:top_k]
+
+    def find_similar_skills(
+        self,
+        skill_id: str,
+        top_k: int = 5
+    ) -> List[SearchMatch]:
+        """查找相似 Skill"""
+        entry = self.get(skill_id)
+        if not entry:
+            return []
+
+        results = self.search(entry.content, top_k=top_k + 1)
+
+        # 排除自身
+        return [r for r in results if r.entry_id != skill_id][:top_k]
+
+
+# 全局实例
+_vector_store: Optional[SkillVectorStore] = None
+
+
+def get_vector_store(storage_path: str = None) -> SkillVectorStore:
+    """获取向量存储实例（首次调用时才构建，调用方应在真正需要检索时再获取）"""
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = SkillVectorStore(storage_path)
+    return _vector_store
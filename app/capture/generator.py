@@ -4,15 +4,69 @@ SKILL.md 生成器
 从录制的操作序列自动生成 SKILL.md 文件
 """
 
+import functools
 import re
-from datetime import datetime
+import sys
+from datetime import datetime, timezone
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterable, Iterator, Tuple
+from urllib.parse import urlparse, ParseResult
+
+from .recorder import RecordingSession, RecordedAction, ActionType, ElementSelector
+
+
+# kebab-case 转换：ASCII 名称走 str.translate 查表，其余回退到正则
+_NON_WORD_RE = re.compile(r"[^\w\s-]")
+_SPACE_RE = re.compile(r"[\s_]+")
+_DASH_RE = re.compile(r"-{2,}")
+_KEBAB_TABLE = str.maketrans({
+    chr(c): None if _NON_WORD_RE.match(chr(c)) else "-"
+    for c in range(128)
+    if _NON_WORD_RE.match(chr(c)) or _SPACE_RE.match(chr(c))
+})
+
+# 登录页面关键词 / URL 关键词到标签的映射（按输出顺序排列）
+_LOGIN_KEYWORDS = ("login", "signin")
+_URL_TAG_RULES = (
+    ("pos", "POS"),
+    ("erp", "后台"),
+    ("admin", "后台"),
+    ("app", "App"),
+    ("mobile", "App"),
+)
+_URL_TAGS = tuple(dict.fromkeys(tag for _, tag in _URL_TAG_RULES))
+
+# 产生表单输入的操作类型 / 需要浏览器工具的操作类型
+_FORM_ACTIONS = frozenset({ActionType.FILL, ActionType.TYPE, ActionType.SELECT})
+_NAV_ACTIONS = frozenset({ActionType.NAVIGATE, ActionType.CLICK, ActionType.FILL})
+
+# 浏览器类操作所需的 Playwright 工具（已排序）
+_DEFAULT_TOOLS = (
+    "mcp__playwright__browser_click",
+    "mcp__playwright__browser_fill",
+    "mcp__playwright__browser_navigate",
+    "mcp__playwright__browser_snapshot",
+)
+
+
+def _is_submit(selector: Optional[ElementSelector]) -> bool:
+    """
+    判断选择器是否指向提交按钮
 
-from .recorder import RecordingSession, RecordedAction, ActionType
+    逐个检查 repr 中会出现的文本字段（选择器、备选选择器、标签、文本、属性名和属性值），
+    与在 dataclass repr 中查找 "submit" 等价，但不构造 repr。
+    """
+    if not selector:
+        return False
+    attrs = selector.attributes
+    parts = (
+        selector.selector, selector.tag_name, selector.text_content,
+        *selector.fallback_selectors, *attrs.keys(), *attrs.values(),
+    )
+    return any(part and "submit" in str(part).lower() for part in parts)
 
 
-@dataclass
+@dataclass(slots=True)
 class ExtractedParameter:
     """提取的参数"""
     name: str
@@ -25,22 +79,23 @@ class ExtractedParameter:
 
     def to_yaml(self) -> str:
         """转换为 YAML 格式"""
-        lines = [
-            f"  - name: {self.name}",
-            f"    type: {self.param_type}",
-            f"    required: {str(self.required).lower()}",
-            f"    description: {self.description}",
-        ]
+        return "\n".join(self._iter_lines())
+
+    def _iter_lines(self) -> Iterator[str]:
+        """逐行产出 YAML"""
+        yield f"  - name: {self.name}"
+        yield f"    type: {self.param_type}"
+        yield f"    required: {str(self.required).lower()}"
+        yield f"    description: {self.description}"
         if self.default is not None:
-            lines.append(f"    default: {self.default}")
+            yield f"    default: {self.default}"
         if self.example is not None:
-            lines.append(f'    example: "{self.example}"')
+            yield f'    example: "{self.example}"'
         if self.options:
-            lines.append(f"    options: [{', '.join(self.options)}]")
-        return "\n".join(lines)
+            yield f"    options: [{', '.join(self.options)}]"
 
 
-@dataclass
+@dataclass(slots=True)
 class GeneratedStep:
     """生成的步骤"""
     step_number: int
@@ -52,29 +107,31 @@ class GeneratedStep:
 
     def to_markdown(self) -> str:
         """转换为 Markdown"""
-        lines = [f"### Step {self.step_number}: {self.title}", ""]
+        return "\n".join(self._iter_lines())
+
+    def _iter_lines(self) -> Iterator[str]:
+        """逐行产出 Markdown"""
+        yield f"### Step {self.step_number}: {self.title}"
+        yield ""
 
         if self.description:
-            lines.append(self.description)
-            lines.append("")
+            yield self.description
+            yield ""
 
         if self.actions:
-            lines.append("```")
-            for action in self.actions:
-                lines.append(action)
-            lines.append("```")
-            lines.append("")
+            yield "```"
+            yield from self.actions
+            yield "```"
+            yield ""
 
         if self.notes:
-            lines.append("**注意：**")
+            yield "**注意：**"
             for note in self.notes:
-                lines.append(f"- {note}")
-            lines.append("")
-
-        return "\n".join(lines)
+                yield f"- {note}"
+            yield ""
 
 
-@dataclass
+@dataclass(slots=True)
 class GeneratedSkill:
     """生成的 Skill"""
     name: str
@@ -98,85 +155,105 @@ class GeneratedSkill:
 
     # 元数据
     source_recording_id: Optional[str] = None
-    generated_at: datetime = field(default_factory=datetime.utcnow)
+    generated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    # 变更记录中的年月字符串缓存：(generated_at, "YYYY-MM")
+    _month_cache: Optional[Tuple[datetime, str]] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def generated_month(self) -> str:
+        """生成时间的年月（YYYY-MM），按 generated_at 缓存"""
+        cache = self._month_cache
+        if cache is None or cache[0] != self.generated_at:
+            cache = (self.generated_at, self.generated_at.strftime('%Y-%m'))
+            self._month_cache = cache
+        return cache[1]
 
     def to_skill_md(self) -> str:
         """生成 SKILL.md 内容"""
-        lines = []
+        return "".join(self.iter_skill_md())
+
+    def iter_skill_md(self) -> Iterator[str]:
+        """
+        逐行产出 SKILL.md 内容（每行带换行符）
 
+        写文件时可直接 f.writelines(skill.iter_skill_md())，无需先拼接完整字符串
+        """
+        for line in self._iter_lines():
+            yield f"{line}\n"
+
+    def _iter_lines(self) -> Iterator[str]:
+        """逐行产出 SKILL.md（不含换行符）"""
         # YAML Frontmatter
-        lines.append("---")
-        lines.append(f"name: {self.name}")
-        lines.append(f"description: |")
+        yield "---"
+        yield f"name: {self.name}"
+        yield f"description: |"
         for line in self.description.split("\n"):
-            lines.append(f"  {line}")
+            yield f"  {line}"
 
         if self.allowed_tools:
-            lines.append("allowed-tools:")
+            yield "allowed-tools:"
             for tool in self.allowed_tools:
-                lines.append(f"  - {tool}")
+                yield f"  - {tool}"
 
-        lines.append(f'version: "{self.version}"')
+        yield f'version: "{self.version}"'
 
         if self.category:
-            lines.append(f"category: {self.category}")
+            yield f"category: {self.category}"
 
         if self.tags:
-            lines.append(f"tags: [{', '.join(self.tags)}]")
+            yield f"tags: [{', '.join(self.tags)}]"
 
         # 输入参数
         if self.parameters:
-            lines.append("")
-            lines.append("inputs:")
+            yield ""
+            yield "inputs:"
             for param in self.parameters:
-                lines.append(param.to_yaml())
+                yield from param._iter_lines()
 
-        lines.append("---")
-        lines.append("")
+        yield "---"
+        yield ""
 
         # 标题
-        lines.append(f"# {self.name.replace('-', ' ').title()}")
-        lines.append("")
+        yield f"# {self.name.replace('-', ' ').title()}"
+        yield ""
 
         # 场景说明
-        lines.append("## 场景说明")
-        lines.append("")
-        lines.append(self.description)
-        lines.append("")
+        yield "## 场景说明"
+        yield ""
+        yield self.description
+        yield ""
 
         # 前置条件
         if self.prerequisites:
-            lines.append("## 前置条件")
-            lines.append("")
+            yield "## 前置条件"
+            yield ""
             for prereq in self.prerequisites:
-                lines.append(f"- {prereq}")
-            lines.append("")
+                yield f"- {prereq}"
+            yield ""
 
         # 执行步骤
-        lines.append("## 执行步骤")
-        lines.append("")
+        yield "## 执行步骤"
+        yield ""
         for step in self.steps:
-            lines.append(step.to_markdown())
+            yield from step._iter_lines()
 
         # 常见问题
         if self.faqs:
-            lines.append("## 常见问题处理")
-            lines.append("")
+            yield "## 常见问题处理"
+            yield ""
             for i, faq in enumerate(self.faqs, 1):
-                lines.append(f"### Q{i}: {faq['question']}")
-                lines.append(f"- 原因：{faq.get('cause', '待补充')}")
-                lines.append(f"- 解决：{faq.get('solution', '待补充')}")
-                lines.append("")
+                yield f"### Q{i}: {faq['question']}"
+                yield f"- 原因：{faq.get('cause', '待补充')}"
+                yield f"- 解决：{faq.get('solution', '待补充')}"
+                yield ""
 
         # 元数据
-        lines.append("## 变更记录")
-        lines.append("")
-        lines.append("| 版本 | 日期 | 变更说明 | 作者 |")
-        lines.append("|------|------|---------|------|")
-        lines.append(f"| {self.version} | {self.generated_at.strftime('%Y-%m')} | 从录制生成 | - |")
-        lines.append("")
-
-        return "\n".join(lines)
+        yield "## 变更记录"
+        yield ""
+        yield "| 版本 | 日期 | 变更说明 | 作者 |"
+        yield "|------|------|---------|------|"
+        yield f"| {self.version} | {self.generated_month} | 从录制生成 | - |"
 
 
 class SkillGenerator:
@@ -200,6 +277,14 @@ class SkillGenerator:
         "email": (r"[\w.-]+@[\w.-]+", "string", "邮箱"),
     }
 
+    # 所有参数模式按声明顺序（即优先级）合并为一个正则：每个分支是"值中任意位置出现该模式"的前瞻，
+    # 从值开头匹配一次即得到优先级最高的命中模式，按 lastgroup 分派
+    _COMBINED_RE = re.compile(
+        "|".join(f"(?=.*?(?P<{name}>{pattern}))" for name, (pattern, _, _) in PARAM_PATTERNS.items()),
+        re.DOTALL,
+    )
+    _PARAM_META = {name: (param_type, desc) for name, (_, param_type, desc) in PARAM_PATTERNS.items()}
+
     # 步骤合并规则
     MERGE_RULES = {
         # 连续的填充操作合并为表单填写
@@ -208,6 +293,17 @@ class SkillGenerator:
         "navigation": [ActionType.NAVIGATE, ActionType.WAIT_FOR_ELEMENT],
     }
 
+    # 合并规则的查找形式：表单类操作可互相合并；导航后可跟随等待操作
+    _FORM_FILL_TYPES = frozenset(MERGE_RULES["form_fill"])
+    _NAV_LEADER_TYPE = MERGE_RULES["navigation"][0]
+    _NAV_FOLLOWER_TYPES = frozenset(MERGE_RULES["navigation"][1:])
+
+    # 按首个操作类型推断的步骤标题
+    _TITLE_BY_TYPE = {
+        ActionType.NAVIGATE: "打开页面",
+        ActionType.FILL: "填写表单",
+    }
+
     def __init__(self):
         pass
 
@@ -230,9 +326,12 @@ class SkillGenerator:
         Returns:
             GeneratedSkill
         """
+        # 起始 URL 只解析一次，供名称和描述推断复用
+        parsed_url = urlparse(recording.start_url) if recording.start_url else None
+
         # 生成名称
         if not skill_name:
-            skill_name = self._generate_name(recording)
+            skill_name = self._generate_name(recording, parsed_url)
 
         # 提取参数
         parameters = self._extract_parameters(recording.actions)
@@ -244,13 +343,12 @@ class SkillGenerator:
         allowed_tools = self._extract_tools(recording.actions)
 
         # 生成描述
-        description = self._generate_description(recording, steps)
-
-        # 推断前置条件
-        prerequisites = self._infer_prerequisites(recording)
+        description = self._generate_description(recording, steps, parsed_url)
 
-        # 生成标签
-        tags = self._generate_tags(recording, category)
+        # 一次扫描 URL，推断前置条件和标签
+        needs_login, url_tags = self._analyze_urls(recording)
+        prerequisites = self._infer_prerequisites(recording, needs_login)
+        tags = self._generate_tags(category, url_tags)
 
         return GeneratedSkill(
             name=skill_name,
@@ -264,57 +362,58 @@ class SkillGenerator:
             source_recording_id=recording.session_id,
         )
 
-    def _generate_name(self, recording: RecordingSession) -> str:
+    def _generate_name(self, recording: RecordingSession, parsed_url: Optional[ParseResult] = None) -> str:
         """生成 Skill 名称"""
         if recording.name:
             # 转换为 kebab-case
             name = recording.name.lower()
-            name = re.sub(r"[^\w\s-]", "", name)
-            name = re.sub(r"[\s_]+", "-", name)
-            return name
+            if name.isascii():
+                name = name.translate(_KEBAB_TABLE)
+            else:
+                name = _SPACE_RE.sub("-", _NON_WORD_RE.sub("", name))
+            return _DASH_RE.sub("-", name).strip("-")
 
         # 从 URL 推断
-        if recording.start_url:
+        if parsed_url:
             # 提取路径中的关键词
-            path = recording.start_url.split("/")[-1]
-            if path and not path.startswith("?"):
-                return path.split("?")[0].replace("_", "-")
+            path = parsed_url.path.rsplit("/", 1)[-1]
+            if path:
+                return path.replace("_", "-")
 
         return f"recorded-skill-{recording.session_id[:6]}"
 
-    def _extract_parameters(self, actions: List[RecordedAction]) -> List[ExtractedParameter]:
+    def _extract_parameters(self, actions: Iterable[RecordedAction]) -> List[ExtractedParameter]:
         """提取参数"""
-        parameters = []
-        seen_params = set()
+        # 以参数名为键，dict 天然保留插入顺序
+        found: Dict[str, ExtractedParameter] = {}
 
         for action in actions:
-            if action.action_type not in (ActionType.FILL, ActionType.TYPE, ActionType.SELECT):
+            if action.action_type not in _FORM_ACTIONS:
                 continue
 
             if not action.value:
                 continue
 
             # 检查值是否匹配参数模式
-            for param_name, (pattern, param_type, desc) in self.PARAM_PATTERNS.items():
-                if re.search(pattern, action.value):
-                    if param_name not in seen_params:
-                        seen_params.add(param_name)
-                        parameters.append(ExtractedParameter(
-                            name=param_name,
-                            param_type=param_type,
-                            description=desc,
-                            example=action.value,
-                        ))
-                    break
+            match = self._COMBINED_RE.match(action.value)
+            if match:
+                param_name = match.lastgroup
+                if param_name not in found:
+                    param_type, desc = self._PARAM_META[param_name]
+                    found[param_name] = ExtractedParameter(
+                        name=param_name,
+                        param_type=param_type,
+                        description=desc,
+                        example=action.value,
+                    )
             else:
                 # 从元素信息推断参数
                 if action.selector:
                     param = self._infer_param_from_selector(action)
-                    if param and param.name not in seen_params:
-                        seen_params.add(param.name)
-                        parameters.append(param)
+                    if param:
+                        found.setdefault(param.name, param)
 
-        return parameters
+        return list(found.values())
 
     def _infer_param_from_selector(self, action: RecordedAction) -> Optional[ExtractedParameter]:
         """从选择器推断参数"""
@@ -336,6 +435,9 @@ class SkillGenerator:
         if not param_name:
             return None
 
+        # 参数名在批量生成时高度重复，驻留后各 Skill 共享同一字符串对象
+        param_name = sys.intern(param_name)
+
         # 推断类型
         input_type = attrs.get("type", "text")
         if input_type == "number":
@@ -354,7 +456,7 @@ class SkillGenerator:
             example=action.value,
         )
 
-    def _generate_steps(self, actions: List[RecordedAction]) -> List[GeneratedStep]:
+    def _generate_steps(self, actions: Iterable[RecordedAction]) -> List[GeneratedStep]:
         """生成步骤"""
         steps = []
         current_step_actions = []
@@ -373,7 +475,7 @@ class SkillGenerator:
             current_step_actions.append(action)
 
             # 某些操作后创建新步骤
-            if action.action_type in (ActionType.CLICK,) and "submit" in str(action.selector).lower():
+            if action.action_type is ActionType.CLICK and _is_submit(action.selector):
                 step_number += 1
                 steps.append(self._create_step(step_number, current_step_actions, current_page))
                 current_step_actions = []
@@ -398,10 +500,11 @@ class SkillGenerator:
         # 生成描述
         description = self._generate_step_description(actions)
 
-        # 生成操作列表
-        action_lines = []
-        for i, action in enumerate(actions, 1):
-            action_lines.append(f"{i}. {action.get_description()}")
+        # 生成操作列表（合并后的每组操作占一行）
+        action_lines = [
+            f"{i}. {'，'.join(a.get_description() for a in group)}"
+            for i, group in enumerate(self._merge_actions(actions), 1)
+        ]
 
         return GeneratedStep(
             step_number=step_number,
@@ -410,6 +513,40 @@ class SkillGenerator:
             actions=action_lines,
         )
 
+    def _merge_actions(self, actions: List[RecordedAction]) -> List[List[RecordedAction]]:
+        """
+        按 MERGE_RULES 合并连续操作
+
+        - form_fill: 同一页面上连续的填写/输入/选择合并为一组
+        - navigation: 导航及其后紧跟的等待元素合并为一组
+        """
+        groups: List[List[RecordedAction]] = []
+
+        for action in actions:
+            if groups:
+                group = groups[-1]
+                first, prev = group[0], group[-1]
+                action_type = action.action_type
+
+                if (
+                    action_type in self._FORM_FILL_TYPES
+                    and prev.action_type in self._FORM_FILL_TYPES
+                    and action.page_url == prev.page_url
+                ):
+                    group.append(action)
+                    continue
+
+                if (
+                    action_type in self._NAV_FOLLOWER_TYPES
+                    and first.action_type is self._NAV_LEADER_TYPE
+                ):
+                    group.append(action)
+                    continue
+
+            groups.append([action])
+
+        return groups
+
     def _generate_step_title(self, actions: List[RecordedAction], page_url: str = None) -> str:
         """生成步骤标题"""
         # 从 URL 推断
@@ -424,11 +561,11 @@ class SkillGenerator:
         # 从操作推断
         if actions:
             first_action = actions[0]
-            if first_action.action_type == ActionType.NAVIGATE:
-                return "打开页面"
-            elif first_action.action_type == ActionType.FILL:
-                return "填写表单"
-            elif first_action.action_type == ActionType.CLICK:
+            action_type = first_action.action_type
+            title = self._TITLE_BY_TYPE.get(action_type)
+            if title:
+                return title
+            if action_type is ActionType.CLICK:
                 target = first_action.selector.get_description() if first_action.selector else ""
                 return f"点击 {target}"
 
@@ -436,10 +573,13 @@ class SkillGenerator:
 
     def _generate_step_description(self, actions: List[RecordedAction]) -> str:
         """生成步骤描述"""
-        action_types = [a.action_type for a in actions]
-
-        fill_count = action_types.count(ActionType.FILL) + action_types.count(ActionType.TYPE)
-        click_count = action_types.count(ActionType.CLICK)
+        fill_count = click_count = 0
+        for a in actions:
+            action_type = a.action_type
+            if action_type is ActionType.FILL or action_type is ActionType.TYPE:
+                fill_count += 1
+            elif action_type is ActionType.CLICK:
+                click_count += 1
 
         if fill_count > 2:
             return "在此页面填写以下信息："
@@ -448,21 +588,18 @@ class SkillGenerator:
 
         return ""
 
-    def _extract_tools(self, actions: List[RecordedAction]) -> List[str]:
+    def _extract_tools(self, actions: Iterable[RecordedAction]) -> List[str]:
         """提取需要的工具"""
-        tools = set()
+        if any(action.action_type in _NAV_ACTIONS for action in actions):
+            return list(_DEFAULT_TOOLS)
+        return []
 
-        for action in actions:
-            if action.action_type in (ActionType.NAVIGATE, ActionType.CLICK, ActionType.FILL):
-                tools.add("mcp__playwright__browser_navigate")
-                tools.add("mcp__playwright__browser_click")
-                tools.add("mcp__playwright__browser_fill")
-                tools.add("mcp__playwright__browser_snapshot")
-                break
-
-        return sorted(list(tools))
-
-    def _generate_description(self, recording: RecordingSession, steps: List[GeneratedStep]) -> str:
+    def _generate_description(
+        self,
+        recording: RecordingSession,
+        steps: List[GeneratedStep],
+        parsed_url: Optional[ParseResult] = None
+    ) -> str:
         """生成 Skill 描述"""
         parts = []
 
@@ -474,23 +611,41 @@ class SkillGenerator:
             parts.append(f"自动化执行 {step_count} 个步骤，涉及 {page_count} 个页面。")
 
         # 添加触发条件
-        if recording.start_url:
-            domain = recording.start_url.split("/")[2] if "//" in recording.start_url else ""
-            if domain:
-                parts.append(f"适用于 {domain} 相关操作。")
+        if parsed_url and parsed_url.netloc:
+            parts.append(f"适用于 {parsed_url.netloc} 相关操作。")
 
         return "\n".join(parts)
 
-    def _infer_prerequisites(self, recording: RecordingSession) -> List[str]:
+    def _analyze_urls(self, recording: RecordingSession) -> Tuple[bool, List[str]]:
+        """
+        单次扫描起始 URL 和访问过的页面
+
+        Returns:
+            (是否需要登录, 从 URL 推断的标签)
+        """
+        urls = set(recording.pages_visited)
+        if recording.start_url:
+            urls.add(recording.start_url)
+
+        needs_login = False
+        found_tags = set()
+        for url in urls:
+            url_lower = url.lower()
+            if not needs_login and any(k in url_lower for k in _LOGIN_KEYWORDS):
+                needs_login = True
+            for keyword, tag in _URL_TAG_RULES:
+                if keyword in url_lower:
+                    found_tags.add(tag)
+
+        return needs_login, [tag for tag in _URL_TAGS if tag in found_tags]
+
+    def _infer_prerequisites(self, recording: RecordingSession, needs_login: bool) -> List[str]:
         """推断前置条件"""
         prerequisites = []
 
         # 检查是否需要登录
-        if recording.pages_visited:
-            for url in recording.pages_visited:
-                if "login" in url.lower() or "signin" in url.lower():
-                    prerequisites.append("已登录相关系统")
-                    break
+        if needs_login:
+            prerequisites.append("已登录相关系统")
 
         # 检查浏览器要求
         if recording.browser_info:
@@ -500,22 +655,15 @@ class SkillGenerator:
 
         return prerequisites
 
-    def _generate_tags(self, recording: RecordingSession, category: str = None) -> List[str]:
+    def _generate_tags(self, category: Optional[str], url_tags: List[str]) -> List[str]:
         """生成标签"""
         tags = []
 
         if category:
-            tags.append(category)
+            tags.append(sys.intern(category))
 
         # 从 URL 推断
-        if recording.start_url:
-            url_lower = recording.start_url.lower()
-            if "pos" in url_lower:
-                tags.append("POS")
-            if "erp" in url_lower or "admin" in url_lower:
-                tags.append("后台")
-            if "app" in url_lower or "mobile" in url_lower:
-                tags.append("App")
+        tags.extend(url_tags)
 
         tags.append("自动生成")
 
@@ -523,12 +671,7 @@ class SkillGenerator:
 
 
 # 全局生成器实例
-_generator: Optional[SkillGenerator] = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_generator() -> SkillGenerator:
     """获取生成器实例"""
-    global _generator
-    if _generator is None:
-        _generator = SkillGenerator()
-    return _generator
+    return SkillGenerator()
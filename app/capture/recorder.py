@@ -4,12 +4,21 @@
 录制 Chrome/Playwright 浏览器操作，生成操作序列
 """
 
-import uuid
+import functools
+import json
+import secrets
+import time
+from collections import deque
 from datetime import datetime
-from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Optional, Deque, Dict, List, Any, Set, Tuple
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:  # 可选依赖，缺失时回退到标准库 json
+    orjson = None
+
 
 class ActionType(str, Enum):
     """操作类型"""
@@ -54,12 +63,39 @@ class ActionType(str, Enum):
     UPLOAD_FILE = "upload_file"
 
 
-@dataclass
+class SelectorType(str, Enum):
+    """选择器类型"""
+    CSS = "css"
+    XPATH = "xpath"
+    TEXT = "text"
+    ROLE = "role"
+    TEST_ID = "test_id"
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> "SelectorType":
+        """解析选择器类型，未知值按 CSS 处理（直接使用原始选择器）"""
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.CSS
+
+
+# 选择器类型 → Playwright 选择器格式
+_PLAYWRIGHT_FORMATS: Dict[SelectorType, str] = {
+    SelectorType.CSS: "{s}",
+    SelectorType.XPATH: "xpath={s}",
+    SelectorType.TEXT: "text={s}",
+    SelectorType.ROLE: "role={s}",
+    SelectorType.TEST_ID: "[data-testid='{s}']",
+}
+
+
+@dataclass(slots=True)
 class ElementSelector:
     """元素选择器"""
     # 主选择器
     selector: str
-    selector_type: str = "css"  # css, xpath, text, role, test_id
+    selector_type: SelectorType = SelectorType.CSS
 
     # 备选选择器（用于容错）
     fallback_selectors: List[str] = field(default_factory=list)
@@ -72,22 +108,24 @@ class ElementSelector:
     # 位置信息
     bounding_box: Optional[Dict[str, float]] = None
 
+    # 描述 / Playwright 选择器缓存（选择器创建后视为不可变）
+    _description_cache: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _pw_cache: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
     def to_playwright_selector(self) -> str:
-        """转换为 Playwright 选择器"""
-        if self.selector_type == "css":
-            return self.selector
-        elif self.selector_type == "xpath":
-            return f"xpath={self.selector}"
-        elif self.selector_type == "text":
-            return f"text={self.selector}"
-        elif self.selector_type == "role":
-            return f"role={self.selector}"
-        elif self.selector_type == "test_id":
-            return f"[data-testid='{self.selector}']"
-        return self.selector
+        """转换为 Playwright 选择器（首次计算后缓存）"""
+        if self._pw_cache is None:
+            self._pw_cache = _PLAYWRIGHT_FORMATS.get(self.selector_type, "{s}").format(s=self.selector)
+        return self._pw_cache
 
     def get_description(self) -> str:
-        """获取元素描述"""
+        """获取元素描述（首次计算后缓存）"""
+        if self._description_cache is None:
+            self._description_cache = self._build_description()
+        return self._description_cache
+
+    def _build_description(self) -> str:
+        """构造元素描述"""
         parts = []
 
         if self.tag_name:
@@ -109,7 +147,21 @@ class ElementSelector:
         return " ".join(parts) if parts else self.selector
 
 
-@dataclass
+# 操作类型 → (描述模板, 无选择器时的默认目标)；默认目标为 None 表示模板不涉及目标元素
+_DESCRIPTION_TEMPLATES: Dict[ActionType, Tuple[str, Optional[str]]] = {
+    ActionType.NAVIGATE: ("导航到 {url}", None),
+    ActionType.CLICK: ("点击 {target}", "元素"),
+    ActionType.TYPE: ("在 {target} 输入 '{value}'", "输入框"),
+    ActionType.FILL: ("填写 {target} 为 '{value}'", "输入框"),
+    ActionType.SELECT: ("在 {target} 选择 '{value}'", "下拉框"),
+    ActionType.PRESS_KEY: ("按下 {key} 键", None),
+    ActionType.WAIT_FOR_ELEMENT: ("等待 {target} 出现", "元素"),
+    ActionType.WAIT_FOR_TEXT: ("等待文本 '{value}' 出现", None),
+    ActionType.ASSERT_TEXT: ("验证文本 '{value}' 存在", None),
+}
+
+
+@dataclass(slots=True)
 class RecordedAction:
     """录制的操作"""
     action_id: str
@@ -139,15 +191,31 @@ class RecordedAction:
     # 生成的代码（用于预览）
     generated_code: Optional[str] = None
 
+    # 操作描述缓存（录制完成后操作视为不可变，可在多次生成间复用）
+    _description: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    # 序列化结果缓存
+    _cached_dict: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
+        """
+        转换为字典（首次计算后缓存）
+
+        每次返回同一个缓存字典，调用方只读使用，不得修改。
+        """
+        if self._cached_dict is None:
+            self._cached_dict = self._build_dict()
+        return self._cached_dict
+
+    def _build_dict(self) -> Dict[str, Any]:
+        """构造字典"""
         return {
             "action_id": self.action_id,
             "action_type": self.action_type.value,
             "timestamp": self.timestamp.isoformat(),
             "selector": {
                 "selector": self.selector.selector,
-                "selector_type": self.selector.selector_type,
+                "selector_type": self.selector.selector_type.value,
                 "description": self.selector.get_description(),
             } if self.selector else None,
             "url": self.url,
@@ -161,43 +229,56 @@ class RecordedAction:
         }
 
     def get_description(self) -> str:
-        """获取操作描述"""
-        if self.action_type == ActionType.NAVIGATE:
-            return f"导航到 {self.url}"
-        elif self.action_type == ActionType.CLICK:
-            target = self.selector.get_description() if self.selector else "元素"
-            return f"点击 {target}"
-        elif self.action_type == ActionType.TYPE:
-            target = self.selector.get_description() if self.selector else "输入框"
-            return f"在 {target} 输入 '{self.value}'"
-        elif self.action_type == ActionType.FILL:
-            target = self.selector.get_description() if self.selector else "输入框"
-            return f"填写 {target} 为 '{self.value}'"
-        elif self.action_type == ActionType.SELECT:
-            target = self.selector.get_description() if self.selector else "下拉框"
-            return f"在 {target} 选择 '{self.value}'"
-        elif self.action_type == ActionType.PRESS_KEY:
-            return f"按下 {self.key} 键"
-        elif self.action_type == ActionType.WAIT_FOR_ELEMENT:
-            target = self.selector.get_description() if self.selector else "元素"
-            return f"等待 {target} 出现"
-        elif self.action_type == ActionType.WAIT_FOR_TEXT:
-            return f"等待文本 '{self.value}' 出现"
-        elif self.action_type == ActionType.ASSERT_TEXT:
-            return f"验证文本 '{self.value}' 存在"
-        else:
+        """获取操作描述（首次计算后缓存）"""
+        if self._description is None:
+            self._description = self._build_description()
+        return self._description
+
+    def _build_description(self) -> str:
+        """构造操作描述"""
+        spec = _DESCRIPTION_TEMPLATES.get(self.action_type)
+        if spec is None:
             return f"{self.action_type.value}"
 
+        template, default_target = spec
+        target = None
+        if default_target is not None:
+            target = self.selector.get_description() if self.selector else default_target
+        return template.format(target=target, url=self.url, value=self.value, key=self.key)
+
+
+def _now_like(reference: datetime) -> datetime:
+    """与 reference 时区约定一致的当前时间（带时区时返回同时区时间，否则为 naive UTC）"""
+    if reference.tzinfo is not None:
+        return datetime.now(reference.tzinfo)
+    return datetime.utcnow()
+
+
+def _json_default(obj: Any) -> Any:
+    """
+    RecordingSession.to_json 的兜底序列化
+
+    orjson 原生处理 dataclass / Enum / datetime，仅 deque 需要转换；
+    回退到标准库 json 时按 orjson 的规则手工展开（跳过 "_" 开头的缓存字段）。
+    """
+    if isinstance(obj, deque):
+        return list(obj)
+    if is_dataclass(obj):
+        return {f.name: getattr(obj, f.name) for f in fields(obj) if not f.name.startswith("_")}
+    if isinstance(obj, datetime):
+        return obj.isoformat() if obj.tzinfo else obj.isoformat() + "+00:00"
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
 
-@dataclass
+@dataclass(slots=True)
 class RecordingSession:
     """录制会话"""
     session_id: str
     name: Optional[str] = None
     description: Optional[str] = None
 
-    # 操作列表
-    actions: List[RecordedAction] = field(default_factory=list)
+    # 操作列表（只追加、顺序遍历，deque 追加无扩容拷贝）
+    actions: Deque[RecordedAction] = field(default_factory=deque)
 
     # 起始信息
     start_url: Optional[str] = None
@@ -207,8 +288,12 @@ class RecordingSession:
     end_time: Optional[datetime] = None
     status: str = "recording"  # recording, completed, failed
 
-    # 页面信息
+    # 页面信息（列表保持访问顺序，集合用于 O(1) 去重）
     pages_visited: List[str] = field(default_factory=list)
+    _visited_set: Set[str] = field(default_factory=set, init=False, repr=False, compare=False)
+
+    # 会话内操作 ID 计数器（操作 ID 只需在会话内唯一）
+    _action_counter: int = field(default=0, init=False, repr=False, compare=False)
 
     # 录制者
     recorded_by: Optional[str] = None
@@ -217,27 +302,49 @@ class RecordingSession:
     browser_info: Dict[str, Any] = field(default_factory=dict)
     metadata: Dict[str, Any] = field(default_factory=dict)
 
+    # 单调时钟起点与结束时缓存的时长（避免轮询时反复构造 datetime）
+    _start_monotonic: int = field(default=0, init=False, repr=False, compare=False)
+    _duration_cache: Optional[float] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._visited_set.update(self.pages_visited)
+        # 以 start_time 为准对齐单调时钟，兼容传入历史 start_time 的会话
+        offset = _now_like(self.start_time) - self.start_time
+        self._start_monotonic = time.monotonic_ns() - int(offset.total_seconds() * 1e9)
+
     @property
     def duration_ms(self) -> float:
+        if self._duration_cache is not None:
+            return self._duration_cache
         if self.end_time:
-            return (self.end_time - self.start_time).total_seconds() * 1000
-        return (datetime.utcnow() - self.start_time).total_seconds() * 1000
+            self._duration_cache = (self.end_time - self.start_time).total_seconds() * 1000
+            return self._duration_cache
+        return (time.monotonic_ns() - self._start_monotonic) / 1e6
 
     @property
     def action_count(self) -> int:
         return len(self.actions)
 
+    def next_action_id(self) -> str:
+        """分配会话内唯一的操作 ID"""
+        action_id = f"{self._action_counter:08x}"
+        self._action_counter += 1
+        return action_id
+
     def add_action(self, action: RecordedAction):
         """添加操作"""
         self.actions.append(action)
 
         # 更新页面列表
-        if action.page_url and action.page_url not in self.pages_visited:
-            self.pages_visited.append(action.page_url)
+        page_url = action.page_url
+        if page_url and page_url not in self._visited_set:
+            self._visited_set.add(page_url)
+            self.pages_visited.append(page_url)
 
     def complete(self):
         """完成录制"""
-        self.end_time = datetime.utcnow()
+        self.end_time = _now_like(self.start_time)
+        self._duration_cache = (time.monotonic_ns() - self._start_monotonic) / 1e6
         self.status = "completed"
 
     def to_dict(self) -> Dict[str, Any]:
@@ -259,6 +366,28 @@ class RecordingSession:
             "metadata": self.metadata,
         }
 
+    def to_json(self) -> bytes:
+        """
+        序列化为 JSON 字节串（导出用）
+
+        操作直接以 dataclass 交给 orjson，整棵对象树在 C 中一次遍历完成，
+        不逐个构造操作字典；"_" 开头的缓存字段不输出，派生的 duration_ms / action_count 一并输出。
+        """
+        data = {f.name: getattr(self, f.name) for f in _SESSION_FIELDS}
+        data["duration_ms"] = self.duration_ms
+        data["action_count"] = self.action_count
+        if orjson is not None:
+            return orjson.dumps(
+                data,
+                default=_json_default,
+                option=orjson.OPT_SERIALIZE_DATACLASS | orjson.OPT_NAIVE_UTC,
+            )
+        return json.dumps(data, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+
+# RecordingSession 中需要导出的字段（跳过 "_" 开头的缓存字段）
+_SESSION_FIELDS = tuple(f for f in fields(RecordingSession) if not f.name.startswith("_"))
+
 
 class ActionRecorder:
     """
@@ -271,6 +400,24 @@ class ActionRecorder:
     - 导出录制数据
     """
 
+    # 操作类型 → Playwright 代码模板
+    _CODE_TEMPLATES: Dict[ActionType, str] = {
+        ActionType.NAVIGATE: 'await page.goto("{url}")',
+        ActionType.CLICK: 'await page.click("{selector}")',
+        ActionType.FILL: 'await page.fill("{selector}", "{value}")',
+        ActionType.TYPE: 'await page.type("{selector}", "{value}")',
+        ActionType.SELECT: 'await page.selectOption("{selector}", "{value}")',
+        ActionType.PRESS_KEY: 'await page.keyboard.press("{key}")',
+        ActionType.WAIT_FOR_ELEMENT: 'await page.waitForSelector("{selector}")',
+        ActionType.WAIT_FOR_TEXT: 'await page.waitForSelector("text={value}")',
+        ActionType.ASSERT_TEXT: 'await expect(page.locator("text={value}")).toBeVisible()',
+    }
+
+    # 模板中需要元素选择器的操作类型
+    _SELECTOR_CODE_TYPES = frozenset(
+        action_type for action_type, template in _CODE_TEMPLATES.items() if "{selector}" in template
+    )
+
     def __init__(self):
         self._sessions: Dict[str, RecordingSession] = {}
         self._current_session: Optional[RecordingSession] = None
@@ -284,7 +431,7 @@ class ActionRecorder:
     ) -> RecordingSession:
         """开始录制会话"""
         session = RecordingSession(
-            session_id=str(uuid.uuid4())[:12],
+            session_id=secrets.token_hex(6),
             name=name or f"Recording {datetime.now().strftime('%Y%m%d_%H%M%S')}",
             start_url=start_url,
             recorded_by=recorded_by,
@@ -323,7 +470,7 @@ class ActionRecorder:
             raise ValueError("No active recording session")
 
         action = RecordedAction(
-            action_id=str(uuid.uuid4())[:8],
+            action_id=session.next_action_id(),
             action_type=action_type,
             timestamp=datetime.utcnow(),
             selector=selector,
@@ -364,39 +511,14 @@ class ActionRecorder:
 
     def _generate_code(self, action: RecordedAction) -> str:
         """为操作生成 Playwright 代码"""
-        if action.action_type == ActionType.NAVIGATE:
-            return f'await page.goto("{action.url}")'
-
-        if action.action_type == ActionType.CLICK:
-            selector = action.selector.to_playwright_selector() if action.selector else ""
-            return f'await page.click("{selector}")'
-
-        if action.action_type == ActionType.FILL:
-            selector = action.selector.to_playwright_selector() if action.selector else ""
-            return f'await page.fill("{selector}", "{action.value}")'
-
-        if action.action_type == ActionType.TYPE:
-            selector = action.selector.to_playwright_selector() if action.selector else ""
-            return f'await page.type("{selector}", "{action.value}")'
-
-        if action.action_type == ActionType.SELECT:
-            selector = action.selector.to_playwright_selector() if action.selector else ""
-            return f'await page.selectOption("{selector}", "{action.value}")'
-
-        if action.action_type == ActionType.PRESS_KEY:
-            return f'await page.keyboard.press("{action.key}")'
+        template = self._CODE_TEMPLATES.get(action.action_type)
+        if template is None:
+            return f"# {action.action_type.value}"
 
-        if action.action_type == ActionType.WAIT_FOR_ELEMENT:
-            selector = action.selector.to_playwright_selector() if action.selector else ""
-            return f'await page.waitForSelector("{selector}")'
-
-        if action.action_type == ActionType.WAIT_FOR_TEXT:
-            return f'await page.waitForSelector("text={action.value}")'
-
-        if action.action_type == ActionType.ASSERT_TEXT:
-            return f'await expect(page.locator("text={action.value}")).toBeVisible()'
-
-        return f"# {action.action_type.value}"
+        selector = ""
+        if action.selector and action.action_type in self._SELECTOR_CODE_TYPES:
+            selector = action.selector.to_playwright_selector()
+        return template.format(selector=selector, url=action.url, value=action.value, key=action.key)
 
     # ==================== Playwright 集成 ====================
 
@@ -409,54 +531,36 @@ class ActionRecorder:
 
         element_info 来自 Playwright 的 evaluate 或 DevTools
         """
-        # 优先使用 test-id
-        if element_info.get("testId"):
-            return ElementSelector(
-                selector=element_info["testId"],
-                selector_type="test_id",
-                tag_name=element_info.get("tagName"),
-                text_content=element_info.get("textContent"),
-                attributes=element_info.get("attributes", {}),
-            )
-
-        # 其次使用 id
-        if element_info.get("id"):
-            return ElementSelector(
-                selector=f"#{element_info['id']}",
-                selector_type="css",
-                tag_name=element_info.get("tagName"),
-                text_content=element_info.get("textContent"),
-                attributes=element_info.get("attributes", {}),
-            )
-
-        # 使用 role + name
-        if element_info.get("role") and element_info.get("name"):
-            return ElementSelector(
-                selector=f"{element_info['role']}[name='{element_info['name']}']",
-                selector_type="role",
-                tag_name=element_info.get("tagName"),
-                text_content=element_info.get("textContent"),
-                attributes=element_info.get("attributes", {}),
-            )
-
-        # 使用文本内容
-        if element_info.get("textContent") and len(element_info["textContent"]) < 50:
-            return ElementSelector(
-                selector=element_info["textContent"],
-                selector_type="text",
-                tag_name=element_info.get("tagName"),
-                text_content=element_info.get("textContent"),
-                attributes=element_info.get("attributes", {}),
-            )
+        # 各字段只查一次，供下面的回退链复用
+        get = element_info.get
+        test_id = get("testId")
+        element_id = get("id")
+        role = get("role")
+        name = get("name")
+        text = get("textContent")
+
+        if test_id:
+            # 优先使用 test-id
+            selector, selector_type = test_id, SelectorType.TEST_ID
+        elif element_id:
+            # 其次使用 id
+            selector, selector_type = f"#{element_id}", SelectorType.CSS
+        elif role and name:
+            # 使用 role + name
+            selector, selector_type = f"{role}[name='{name}']", SelectorType.ROLE
+        elif text and len(text) < 50:
+            # 使用文本内容
+            selector, selector_type = text, SelectorType.TEXT
+        else:
+            # 回退到 CSS 选择器
+            selector, selector_type = self._build_css_selector(element_info), SelectorType.CSS
 
-        # 回退到 CSS 选择器
-        css_selector = self._build_css_selector(element_info)
         return ElementSelector(
-            selector=css_selector,
-            selector_type="css",
-            tag_name=element_info.get("tagName"),
-            text_content=element_info.get("textContent"),
-            attributes=element_info.get("attributes", {}),
+            selector=selector,
+            selector_type=selector_type,
+            tag_name=get("tagName"),
+            text_content=text,
+            attributes=get("attributes", {}),
         )
 
     def _build_css_selector(self, element_info: Dict[str, Any]) -> str:
@@ -483,12 +587,7 @@ class ActionRecorder:
 
 
 # 全局录制器实例
-_recorder: Optional[ActionRecorder] = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_recorder() -> ActionRecorder:
     """获取录制器实例"""
-    global _recorder
-    if _recorder is None:
-        _recorder = ActionRecorder()
-    return _recorder
+    return ActionRecorder()
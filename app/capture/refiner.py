@@ -4,14 +4,22 @@ Skill 优化器
 对生成的 Skill 进行参数化、泛化和增强
 """
 
+import functools
 import re
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any, Set
+from typing import Optional, Dict, Iterator, List, Any, Set
 
 from .generator import GeneratedSkill, ExtractedParameter, GeneratedStep
 
 
-@dataclass
+# 生成步骤中操作行的序号前缀，如 "1. "
+_STEP_PREFIX_RE = re.compile(r"\d+\.\s")
+
+# 硬编码模式都至少包含数字、"@" 或 URL 协议头，不含这些的操作可直接跳过
+_MAYBE_PARAM = re.compile(r"[\d@]|https?://")
+
+
+@dataclass(slots=True)
 class RefineOptions:
     """优化选项"""
     # 参数化
@@ -35,7 +43,7 @@ class RefineOptions:
     add_faqs: bool = True                # 添加常见问题
 
 
-@dataclass
+@dataclass(slots=True)
 class RefineResult:
     """优化结果"""
     skill: GeneratedSkill
@@ -55,25 +63,51 @@ class SkillRefiner:
     - 文档：添加示例、常见问题
     """
 
-    # 常见的硬编码模式
+    # 常见的硬编码模式（类加载时预编译，按特异性从高到低排列）
     HARDCODED_PATTERNS = {
-        "price": r"\d+\.?\d*\s*(元|¥|\$)?",
-        "date": r"\d{4}[-/]\d{2}[-/]\d{2}",
-        "datetime": r"\d{4}[-/]\d{2}[-/]\d{2}\s+\d{2}:\d{2}",
-        "phone": r"1[3-9]\d{9}",
-        "email": r"[\w.-]+@[\w.-]+\.\w+",
-        "url": r"https?://[\w./\-?=&]+",
-        "id": r"[A-Z]{2,4}[-_]?\d{4,}",
+        "datetime": re.compile(r"\d{4}[-/]\d{2}[-/]\d{2}\s+\d{2}:\d{2}"),
+        "date": re.compile(r"\d{4}[-/]\d{2}[-/]\d{2}"),
+        "url": re.compile(r"https?://[\w./\-?=&]+"),
+        "email": re.compile(r"[\w.-]+@[\w.-]+\.\w+"),
+        "phone": re.compile(r"1[3-9]\d{9}"),
+        "id": re.compile(r"[A-Z]{2,4}[-_]?\d{4,}"),
+        "price": re.compile(r"\d+\.?\d*\s*(?:元|¥|\$)?"),
+    }
+
+    # 合并为一个命名分组交替正则：同一位置上优先匹配更具体的模式，
+    # 每个操作只需一次 subn 即完成全部替换
+    _HARDCODED_RE = re.compile(
+        "|".join(f"(?P<{name}>{pattern.pattern})" for name, pattern in HARDCODED_PATTERNS.items())
+    )
+
+    # 参数名 → (参数类型, 参数描述)
+    _PARAM_SPECS = {
+        "price": ("number", "价格（数字）"),
+        "date": ("date", "日期（YYYY-MM-DD）"),
+        "datetime": ("datetime", "日期时间（YYYY-MM-DD HH:mm）"),
+        "phone": ("string", "手机号"),
+        "email": ("string", "邮箱地址"),
+        "url": ("string", "URL 地址"),
+        "id": ("string", "编号/ID"),
     }
 
-    # 不稳定的选择器模式
+    # 不稳定的选择器模式（类加载时预编译）
     UNSTABLE_SELECTOR_PATTERNS = [
-        r"\[class\*='_\w+'\]",        # 动态生成的类名
-        r":nth-child\(\d+\)",          # 位置选择器
-        r"\[style=",                   # 样式选择器
-        r"#\d+",                       # 数字 ID
+        re.compile(r"\[class\*='_\w+'\]"),    # 动态生成的类名
+        re.compile(r":nth-child\(\d+\)"),     # 位置选择器
+        re.compile(r"\[style="),              # 样式选择器
+        re.compile(r"#\d+"),                  # 数字 ID
     ]
 
+    # 合并为一个交替正则，分组名 u{i} 对应 UNSTABLE_SELECTOR_PATTERNS[i]
+    _UNSTABLE_RE = re.compile(
+        "|".join(f"(?P<u{i}>{pattern.pattern})" for i, pattern in enumerate(UNSTABLE_SELECTOR_PATTERNS))
+    )
+
+    # 使用示例的固定首尾
+    _EXAMPLE_HEADER = "\n\n**使用示例：**\n\n```yaml\n"
+    _EXAMPLE_FOOTER = "\n```"
+
     # 常见错误场景
     COMMON_ERROR_SCENARIOS = [
         {"trigger": "网络超时", "solution": "等待 5 秒后重试"},
@@ -133,65 +167,53 @@ class SkillRefiner:
 
         for step in skill.steps:
             for i, action in enumerate(step.actions):
-                # 检查硬编码值
-                for param_name, pattern in self.HARDCODED_PATTERNS.items():
-                    matches = re.findall(pattern, action)
-                    if matches:
-                        # 替换为参数引用
-                        for match in matches:
-                            param_ref = f"${{{param_name}}}"
-                            step.actions[i] = action.replace(match, param_ref)
-
-                        # 添加参数定义
-                        if param_name not in existing_params:
-                            existing_params.add(param_name)
-                            skill.parameters.append(ExtractedParameter(
-                                name=param_name,
-                                param_type=self._infer_param_type(param_name),
-                                description=self._get_param_description(param_name),
-                                example=matches[0],
-                            ))
-                            result.changes_made.append(f"添加参数: {param_name}")
-
-    def _infer_param_type(self, param_name: str) -> str:
-        """推断参数类型"""
-        type_map = {
-            "price": "number",
-            "date": "date",
-            "datetime": "datetime",
-            "phone": "string",
-            "email": "string",
-            "url": "string",
-            "id": "string",
-        }
-        return type_map.get(param_name, "string")
-
-    def _get_param_description(self, param_name: str) -> str:
-        """获取参数描述"""
-        desc_map = {
-            "price": "价格（数字）",
-            "date": "日期（YYYY-MM-DD）",
-            "datetime": "日期时间（YYYY-MM-DD HH:mm）",
-            "phone": "手机号",
-            "email": "邮箱地址",
-            "url": "URL 地址",
-            "id": "编号/ID",
-        }
-        return desc_map.get(param_name, param_name)
+                # 保留 "N. " 序号前缀，只替换操作内容
+                prefix_match = _STEP_PREFIX_RE.match(action)
+                prefix = prefix_match.group(0) if prefix_match else ""
+                body = action[len(prefix):]
+                if not _MAYBE_PARAM.search(body):
+                    continue
+
+                # 单次扫描替换全部硬编码值，记录每个参数首次出现的示例值
+                examples: Dict[str, str] = {}
+
+                def to_param_ref(match: re.Match) -> str:
+                    param_name = match.lastgroup
+                    examples.setdefault(param_name, match.group(0).strip())
+                    return f"${{{param_name}}}"
+
+                new_body, count = self._HARDCODED_RE.subn(to_param_ref, body)
+                if not count:
+                    continue
+                step.actions[i] = prefix + new_body
+
+                # 添加参数定义
+                for param_name, example in examples.items():
+                    if param_name not in existing_params:
+                        existing_params.add(param_name)
+                        param_type, description = self._PARAM_SPECS.get(param_name, ("string", param_name))
+                        skill.parameters.append(ExtractedParameter(
+                            name=param_name,
+                            param_type=param_type,
+                            description=description,
+                            example=example,
+                        ))
+                        result.changes_made.append(f"添加参数: {param_name}")
 
     def _generalize_selectors(self, skill: GeneratedSkill, result: RefineResult):
         """泛化选择器"""
         for step in skill.steps:
-            for i, action in enumerate(step.actions):
-                # 检查不稳定的选择器
-                for pattern in self.UNSTABLE_SELECTOR_PATTERNS:
-                    if re.search(pattern, action):
-                        result.warnings.append(
-                            f"步骤 {step.step_number} 包含不稳定的选择器: {pattern}"
-                        )
-                        result.suggestions.append(
-                            f"建议使用 data-testid 或 role 选择器替代"
-                        )
+            for action in step.actions:
+                # 检查不稳定的选择器：一次扫描找出命中的全部规则
+                hit = {int(m.lastgroup[1:]) for m in self._UNSTABLE_RE.finditer(action)}
+                for index in sorted(hit):
+                    result.warnings.append(
+                        f"步骤 {step.step_number} 包含不稳定的选择器: "
+                        f"{self.UNSTABLE_SELECTOR_PATTERNS[index].pattern}"
+                    )
+                    result.suggestions.append(
+                        f"建议使用 data-testid 或 role 选择器替代"
+                    )
 
     def _add_error_handling(self, skill: GeneratedSkill, result: RefineResult):
         """添加错误处理"""
@@ -218,20 +240,22 @@ class SkillRefiner:
         """添加使用示例"""
         if skill.parameters:
             # 在描述中添加示例
-            example_lines = ["\n\n**使用示例：**\n"]
-            example_lines.append("```yaml")
-            for param in skill.parameters:
-                if param.example:
-                    example_lines.append(f"{param.name}: {param.example}")
-                elif param.default is not None:
-                    example_lines.append(f"{param.name}: {param.default}")
-                else:
-                    example_lines.append(f"{param.name}: <待填写>")
-            example_lines.append("```")
-
-            skill.description += "\n".join(example_lines)
+            skill.description += (
+                self._EXAMPLE_HEADER
+                + "\n".join(f"{param.name}: {self._example_value(param)}" for param in skill.parameters)
+                + self._EXAMPLE_FOOTER
+            )
             result.changes_made.append("添加使用示例")
 
+    @staticmethod
+    def _example_value(param: ExtractedParameter) -> Any:
+        """参数的示例值：示例 > 默认值 > 占位符"""
+        if param.example:
+            return param.example
+        if param.default is not None:
+            return param.default
+        return "<待填写>"
+
     def _add_faqs(self, skill: GeneratedSkill, result: RefineResult):
         """添加常见问题"""
         if not skill.faqs:
@@ -249,64 +273,56 @@ class SkillRefiner:
             ]
             result.changes_made.append("添加常见问题")
 
-    def validate(self, skill: GeneratedSkill) -> List[str]:
-        """验证 Skill 质量"""
-        issues = []
+    def validate(self, skill: GeneratedSkill) -> Iterator[str]:
+        """
+        验证 Skill 质量
 
+        逐条产出问题；只需判断是否通过时用 any() 可在首个问题处提前结束，
+        需要完整列表时用 list()。
+        """
         # 检查必填字段
         if not skill.name:
-            issues.append("缺少 Skill 名称")
+            yield "缺少 Skill 名称"
         if not skill.description:
-            issues.append("缺少 Skill 描述")
+            yield "缺少 Skill 描述"
         if not skill.steps:
-            issues.append("缺少执行步骤")
+            yield "缺少执行步骤"
 
         # 检查参数
         for param in skill.parameters:
             if not param.description:
-                issues.append(f"参数 '{param.name}' 缺少描述")
+                yield f"参数 '{param.name}' 缺少描述"
             if param.required and param.default is None and not param.example:
-                issues.append(f"必填参数 '{param.name}' 缺少示例值")
+                yield f"必填参数 '{param.name}' 缺少示例值"
 
         # 检查步骤
         for step in skill.steps:
             if not step.title:
-                issues.append(f"步骤 {step.step_number} 缺少标题")
+                yield f"步骤 {step.step_number} 缺少标题"
             if not step.actions:
-                issues.append(f"步骤 {step.step_number} 缺少操作")
-
-        return issues
-
-    def suggest_improvements(self, skill: GeneratedSkill) -> List[str]:
-        """建议改进"""
-        suggestions = []
+                yield f"步骤 {step.step_number} 缺少操作"
 
+    def suggest_improvements(self, skill: GeneratedSkill) -> Iterator[str]:
+        """建议改进（逐条产出建议）"""
         # 参数建议
         if len(skill.parameters) > 5:
-            suggestions.append("参数较多，考虑分组或简化")
+            yield "参数较多，考虑分组或简化"
 
         # 步骤建议
         if len(skill.steps) > 10:
-            suggestions.append("步骤较多，考虑拆分为多个 Skill")
+            yield "步骤较多，考虑拆分为多个 Skill"
 
         # 描述建议
         if len(skill.description) < 50:
-            suggestions.append("描述过短，建议添加更多使用场景说明")
+            yield "描述过短，建议添加更多使用场景说明"
 
         # 工具建议
         if not skill.allowed_tools:
-            suggestions.append("未指定允许的工具，建议明确工具列表")
-
-        return suggestions
+            yield "未指定允许的工具，建议明确工具列表"
 
 
 # 全局优化器实例
-_refiner: Optional[SkillRefiner] = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_refiner() -> SkillRefiner:
     """获取优化器实例"""
-    global _refiner
-    if _refiner is None:
-        _refiner = SkillRefiner()
-    return _refiner
+    return SkillRefiner()
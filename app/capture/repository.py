@@ -5,16 +5,81 @@
 """
 
 import os
-import json
+import re
+import shutil
+import atexit
+import hashlib
+import weakref
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
+from typing import TYPE_CHECKING, Optional, Dict, Iterable, List, Any, Set, Tuple
 
+from ._jsonio import dumps, loads
 from .generator import GeneratedSkill
 
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _trigrams(text: str) -> Set[str]:
+    """字符 3-gram 集合（用于子串搜索的倒排索引）"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# 索引需要的 SKILL.md frontmatter 字段
+_FRONTMATTER_KEYS = frozenset({"name", "description", "category", "tags"})
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_frontmatter(
+    file_path: str,
+    mtime_ns: int,
+    size: int
+) -> Tuple[str, str, Optional[str], Tuple[str, ...]]:
+    """
+    读取并解析 SKILL.md 的 frontmatter
+
+    以 (路径, mtime, 大小) 为缓存键，文件未变化时重复扫描不再读取文件。
+
+    Returns:
+        (name, description, category, tags)
+    """
+    content = Path(file_path).read_text(encoding='utf-8')
+
+    name = ""
+    description = ""
+    tags: Tuple[str, ...] = ()
+    category = None
+
+    if content.startswith("---"):
+        parts = content.split("---", 2)
+        if len(parts) >= 3:
+            frontmatter = parts[1]
+
+            # 单次逐行扫描：键须顶格，同名键以首次出现为准
+            fields: Dict[str, str] = {}
+            for line in frontmatter.splitlines():
+                key, sep, value = line.partition(":")
+                if sep and key in _FRONTMATTER_KEYS and key not in fields:
+                    fields[key] = value.strip()
+
+            name = fields.get("name", "")
+            description = fields.get("description", "")
+            category = fields.get("category") or None
 
-@dataclass
+            # tags 只支持行内列表 [a, b]
+            tags_raw = fields.get("tags", "")
+            if len(tags_raw) > 2 and tags_raw[0] == "[" and tags_raw[-1] == "]":
+                tags = tuple(t.strip() for t in tags_raw[1:-1].split(","))
+
+    return name, description, category, tags
+
+
+@dataclass(slots=True)
 class SkillEntry:
     """知识库中的 Skill 条目"""
     skill_id: str
@@ -55,13 +120,14 @@ class SkillEntry:
             "file_path": self.file_path,
             "execution_count": self.execution_count,
             "success_rate": self.success_rate,
+            "avg_duration_ms": self.avg_duration_ms,
             "source": self.source,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """搜索结果"""
     entry: SkillEntry
@@ -69,6 +135,18 @@ class SearchResult:
     matched_fields: List[str]
 
 
+# 退出时需要合并日志的知识库实例（弱引用，不阻止实例被回收）
+_open_repositories: "weakref.WeakSet[KnowledgeRepository]" = weakref.WeakSet()
+
+
+@atexit.register
+def _compact_on_exit():
+    """退出时把各实例未合并的日志写回（目录已被删除的实例跳过）"""
+    for instance in list(_open_repositories):
+        if instance.base_dir.is_dir():
+            instance.compact()
+
+
 class KnowledgeRepository:
     """
     知识库管理器
@@ -78,8 +156,21 @@ class KnowledgeRepository:
     - 元数据索引
     - 全文搜索
     - 统计信息
+
+    执行统计以增量日志（index.wal，每行一条 JSON）追加写入，
+    由 compact() 或下一次完整保存合并进 index.json。
+    日志首行记录其基于的索引代数，代数落后的日志已合并进索引，不再回放。
     """
 
+    # 增量日志累计条数达到该值时自动压缩
+    WAL_COMPACT_THRESHOLD = 1000
+
+    # 扫描文件系统的最大线程数
+    SCAN_MAX_WORKERS = 32
+
+    # 增量日志刷盘的合并窗口（秒）：窗口内的多次 update_stats 只触发一次 flush
+    FLUSH_DELAY = 0.5
+
     def __init__(
         self,
         base_dir: str = None,
@@ -87,22 +178,62 @@ class KnowledgeRepository:
     ):
         self.base_dir = Path(base_dir) if base_dir else Path(".claude/skills")
         self.index_file = self.base_dir / index_file
+        self.wal_file = self.index_file.with_suffix(".wal")
 
         # 内存索引
         self._entries: Dict[str, SkillEntry] = {}
 
+        # 子串搜索倒排索引：3-gram → skill_id 集合；条目序号用于保持结果的插入顺序
+        self._postings: Dict[str, Set[str]] = {}
+        self._entry_grams: Dict[str, Set[str]] = {}
+        self._entry_seq: Dict[str, int] = {}
+        self._next_seq = 0
+
+        # 列式存储（按条目序号对齐）：过滤与统计用向量化运算代替逐条目的 Python 判断；
+        # 删除的条目只清除存活位，空洞过多时按插入顺序重建
+        # numpy 在创建实例时才导入，导入 app.capture 不会加载 numpy
+        import numpy as np
+        self._ids: List[Optional[str]] = []
+        self._live = np.zeros(0, dtype=bool)
+        self._cat = np.empty(0, dtype=object)     # 分类（无分类为 ""）
+        self._src = np.empty(0, dtype=object)     # 来源
+        self._exec = np.zeros(0, dtype=np.int64)  # 执行次数
+        self._sr = np.zeros(0, dtype=np.float64)  # 成功率
+
+        # 增量日志（追加写句柄在首次写入时打开）
+        self._wal = None
+        self._wal_count = 0
+
+        # 保护内存索引与文件写入的可重入锁（读路径只在取快照时短暂持有）
+        self._lock = threading.RLock()
+
+        # 延迟刷盘：_dirty 表示有已写入缓冲但尚未 flush 的记录
+        self._dirty = False
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+
+        # 上次写入的索引内容摘要（内容未变时跳过重写）
+        self._last_saved_digest = b""
+
+        # 索引代数：每次重写 index.json 加一，用于识别过期的增量日志
+        self._generation = 0
+
         # 确保目录存在
         self.base_dir.mkdir(parents=True, exist_ok=True)
 
         # 加载索引
         self._load_index()
 
+        # 退出时把未合并的增量写回 index.json（同时落下尚未刷盘的记录）
+        _open_repositories.add(self)
+
     def _load_index(self):
         """加载索引"""
         if self.index_file.exists():
             try:
-                with open(self.index_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(self.index_file, 'rb') as f:
+                    data = loads(f.read())
+                    self._generation = data.get("generation", 0)
                     for item in data.get("entries", []):
                         entry = SkillEntry(
                             skill_id=item["skill_id"],
@@ -118,63 +249,165 @@ class KnowledgeRepository:
                             avg_duration_ms=item.get("avg_duration_ms", 0.0),
                             source=item.get("source", "manual"),
                         )
-                        self._entries[entry.skill_id] = entry
+                        self._put_entry(entry)
             except Exception as e:
                 print(f"Warning: Failed to load index: {e}")
 
         # 扫描文件系统补充索引
         self._scan_filesystem()
 
+        # 回放增量日志（在扫描之后，日志中可能包含仅存在于文件系统的 Skill）
+        self._replay_wal()
+
+    def _replay_wal(self):
+        """回放执行统计增量日志"""
+        try:
+            with open(self.wal_file, 'rb') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        for i, line in enumerate(lines):
+            try:
+                record = loads(line)
+            except ValueError:
+                self._wal_count += 1
+                continue  # 崩溃时可能留下不完整的最后一行
+
+            if record.get("op") == "base":
+                if i == 0 and record["generation"] != self._generation:
+                    # 日志早于当前索引（保存在清空日志前中断），其中的增量已在索引里
+                    self._wal_count = 1
+                    self._reset_wal()
+                    return
+                continue
+
+            self._wal_count += 1
+            entry = self._entries.get(record["skill_id"])
+            if entry:
+                self._apply_stats(entry, record["ok"], record["ms"], datetime.fromisoformat(record["t"]))
+                self._put_columns(entry)
+
+    def _put_entry(self, entry: SkillEntry):
+        """写入内存索引并更新倒排索引"""
+        skill_id = entry.skill_id
+        if skill_id in self._entries:
+            self._unindex(skill_id)
+        else:
+            self._entry_seq[skill_id] = self._next_seq
+            self._next_seq += 1
+        self._entries[skill_id] = entry
+        self._put_columns(entry)
+
+        grams = set()
+        for text in (entry.name, entry.description, entry.category or "", *entry.tags):
+            grams |= _trigrams(text.lower())
+        self._entry_grams[skill_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(skill_id)
+
+    def _drop_entry(self, skill_id: str):
+        """从内存索引和倒排索引移除"""
+        self._unindex(skill_id)
+        del self._entries[skill_id]
+        row = self._entry_seq.pop(skill_id)
+        self._ids[row] = None
+        self._live[row] = False
+
+        if 2 * len(self._entries) < self._next_seq:
+            self._rebuild_columns()
+
+    def _put_columns(self, entry: SkillEntry):
+        """把条目写入列式存储的对应行"""
+        row = self._entry_seq[entry.skill_id]
+        if row >= len(self._live):
+            self._grow_columns(max(64, 2 * len(self._live)))
+        if row == len(self._ids):
+            self._ids.append(entry.skill_id)
+        self._live[row] = True
+        self._cat[row] = entry.category or ""
+        self._src[row] = entry.source
+        self._exec[row] = entry.execution_count
+        self._sr[row] = entry.success_rate
+
+    def _grow_columns(self, capacity: int):
+        """扩容列数组"""
+        import numpy as np
+
+        def grow(column: "np.ndarray") -> "np.ndarray":
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            return grown
+
+        self._live, self._cat, self._src, self._exec, self._sr = (
+            grow(c) for c in (self._live, self._cat, self._src, self._exec, self._sr)
+        )
+
+    def _rebuild_columns(self):
+        """去掉已删除条目留下的空洞，按插入顺序重新编号"""
+        self._entry_seq = {skill_id: seq for seq, skill_id in enumerate(self._entries)}
+        self._next_seq = len(self._entries)
+        self._ids = []
+        self._live[:] = False
+        for entry in self._entries.values():
+            self._put_columns(entry)
+
+    def _unindex(self, skill_id: str):
+        """从倒排索引移除条目的全部 3-gram"""
+        for gram in self._entry_grams.pop(skill_id, ()):
+            ids = self._postings[gram]
+            ids.discard(skill_id)
+            if not ids:
+                del self._postings[gram]
+
+    def _search_candidates(self, query_lower: str) -> Iterable[SkillEntry]:
+        """
+        用倒排索引筛选可能命中的条目
+
+        子串命中某字段时，查询的每个 3-gram 都必然出现在该条目中，
+        因此对 3-gram 求交集不会漏掉结果；不足 3 个字符的查询退化为全量扫描。
+        """
+        grams = _trigrams(query_lower)
+        with self._lock:
+            if not grams:
+                return list(self._entries.values())
+
+            posting_lists = sorted((self._postings.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*posting_lists)
+            return [self._entries[i] for i in sorted(candidates, key=self._entry_seq.__getitem__)]
+
     def _scan_filesystem(self):
-        """扫描文件系统"""
-        for skill_dir in self.base_dir.iterdir():
-            if skill_dir.is_dir():
-                skill_md = skill_dir / "SKILL.md"
-                if skill_md.exists():
-                    skill_id = skill_dir.name
-                    if skill_id not in self._entries:
-                        # 解析 SKILL.md 添加到索引
-                        try:
-                            entry = self._parse_skill_file(skill_md)
-                            if entry:
-                                self._entries[entry.skill_id] = entry
-                        except Exception:
-                            pass
+        """扫描文件系统（多线程并行读取未入索引的 SKILL.md）"""
+        skill_files = [
+            skill_dir / "SKILL.md"
+            for skill_dir in self.base_dir.iterdir()
+            if skill_dir.is_dir() and skill_dir.name not in self._entries
+        ]
+        if not skill_files:
+            return
+
+        # 读取是 I/O 密集型，线程在等待文件系统时释放 GIL
+        with ThreadPoolExecutor(max_workers=min(self.SCAN_MAX_WORKERS, len(skill_files))) as executor:
+            entries = list(executor.map(self._parse_skill_file_safe, skill_files))
+
+        # 在主线程合并结果
+        for entry in entries:
+            if entry:
+                self._put_entry(entry)
+
+    def _parse_skill_file_safe(self, file_path: Path) -> Optional[SkillEntry]:
+        """解析 SKILL.md，文件缺失或解析失败时返回 None"""
+        try:
+            return self._parse_skill_file(file_path)
+        except Exception:
+            return None
 
     def _parse_skill_file(self, file_path: Path) -> Optional[SkillEntry]:
-        """解析 SKILL.md 文件"""
-        content = file_path.read_text(encoding='utf-8')
-
-        # 简单解析 frontmatter
-        name = ""
-        description = ""
-        tags = []
-        category = None
-
-        if content.startswith("---"):
-            parts = content.split("---", 2)
-            if len(parts) >= 3:
-                frontmatter = parts[1]
-
-                # 提取 name
-                name_match = re.search(r"^name:\s*(.+)$", frontmatter, re.MULTILINE)
-                if name_match:
-                    name = name_match.group(1).strip()
-
-                # 提取 description
-                desc_match = re.search(r"^description:\s*(.+)$", frontmatter, re.MULTILINE)
-                if desc_match:
-                    description = desc_match.group(1).strip()
-
-                # 提取 category
-                cat_match = re.search(r"^category:\s*(.+)$", frontmatter, re.MULTILINE)
-                if cat_match:
-                    category = cat_match.group(1).strip()
-
-                # 提取 tags
-                tags_match = re.search(r"^tags:\s*\[(.+)\]$", frontmatter, re.MULTILINE)
-                if tags_match:
-                    tags = [t.strip() for t in tags_match.group(1).split(",")]
+        """解析 SKILL.md 文件（内容由 get_skill 按需懒加载）"""
+        stat = file_path.stat()
+        name, description, category, tags = _parse_frontmatter(
+            str(file_path), stat.st_mtime_ns, stat.st_size
+        )
 
         skill_id = file_path.parent.name
 
@@ -184,21 +417,87 @@ class KnowledgeRepository:
             description=description,
             version="1.0",
             category=category,
-            tags=tags,
+            tags=list(tags),
             file_path=str(file_path),
             directory=str(file_path.parent),
-            content=content,
             source="file",
         )
 
     def _save_index(self):
-        """保存索引"""
-        data = {
-            "updated_at": datetime.utcnow().isoformat(),
-            "entries": [e.to_dict() for e in self._entries.values()]
-        }
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        """保存索引（先写临时文件再原子替换；内容未变时不重写）"""
+        with self._lock:
+            entries = [e.to_dict() for e in self._entries.values()]
+            digest = hashlib.blake2b(dumps(entries, pretty=False), digest_size=16).digest()
+            if digest != self._last_saved_digest:
+                generation = self._generation + 1
+                data = {
+                    "updated_at": datetime.utcnow(),
+                    "generation": generation,
+                    "entries": entries
+                }
+                tmp_file = self.index_file.with_suffix(".json.tmp")
+                tmp_file.write_bytes(dumps(data))
+                os.replace(tmp_file, self.index_file)
+                self._generation = generation
+                self._last_saved_digest = digest
+
+            # 快照已包含全部增量，清空日志
+            self._reset_wal()
+
+    def _append_wal(self, record: Dict[str, Any]):
+        """追加一条增量记录（延迟刷盘），达到阈值时压缩"""
+        with self._save_lock:
+            if self._wal is None:
+                self._wal = open(self.wal_file, 'ab')
+                if self._wal_count == 0:
+                    self._wal.write(dumps({"op": "base", "generation": self._generation}, pretty=False) + b"\n")
+            self._wal.write(dumps(record, pretty=False) + b"\n")
+            self._wal_count += 1
+
+        if self._wal_count >= self.WAL_COMPACT_THRESHOLD:
+            self.compact()
+        else:
+            self._schedule_save()
+
+    def _schedule_save(self):
+        """标记有未刷盘的记录；窗口内已有定时器时不重复创建"""
+        with self._save_lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.FLUSH_DELAY, self._flush_if_dirty)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def _flush_if_dirty(self):
+        """把缓冲中的增量记录刷到磁盘"""
+        with self._save_lock:
+            self._save_timer = None
+            if self._dirty and self._wal is not None:
+                self._wal.flush()
+            self._dirty = False
+
+    def _reset_wal(self):
+        """清空增量日志"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            self._dirty = False
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+        if self._wal_count:
+            tmp_file = self.wal_file.with_suffix(".wal.tmp")
+            tmp_file.write_bytes(b"")
+            os.replace(tmp_file, self.wal_file)
+            self._wal_count = 0
+
+    def compact(self):
+        """将本实例写入的增量日志合并进 index.json"""
+        with self._lock:
+            if self._wal is not None:
+                self._save_index()
 
     def save_skill(
         self,
@@ -215,50 +514,50 @@ class KnowledgeRepository:
         Returns:
             SkillEntry
         """
-        skill_id = skill.name
-        skill_dir = self.base_dir / skill_id
-
-        # 检查是否存在
-        if skill_dir.exists() and not overwrite:
-            raise ValueError(f"Skill '{skill_id}' already exists")
-
-        # 创建目录
-        skill_dir.mkdir(parents=True, exist_ok=True)
-
-        # 生成内容
-        content = skill.to_skill_md()
-
-        # 保存 SKILL.md
-        skill_file = skill_dir / "SKILL.md"
-        skill_file.write_text(content, encoding='utf-8')
-
-        # 创建索引条目
-        entry = SkillEntry(
-            skill_id=skill_id,
-            name=skill.name,
-            description=skill.description,
-            version=skill.version,
-            category=skill.category,
-            tags=skill.tags,
-            file_path=str(skill_file),
-            directory=str(skill_dir),
-            content=content,
-            source="generated",
-            source_recording_id=skill.source_recording_id,
-        )
-
-        self._entries[skill_id] = entry
-        self._save_index()
+        with self._lock:
+            skill_id = skill.name
+            skill_dir = self.base_dir / skill_id
+
+            # 检查是否存在
+            if skill_dir.exists() and not overwrite:
+                raise ValueError(f"Skill '{skill_id}' already exists")
+
+            # 创建目录
+            skill_dir.mkdir(parents=True, exist_ok=True)
+
+            # 流式写入 SKILL.md，内容由 get_skill 按需懒加载
+            skill_file = skill_dir / "SKILL.md"
+            with open(skill_file, 'w', encoding='utf-8') as f:
+                f.writelines(skill.iter_skill_md())
+
+            # 创建索引条目
+            entry = SkillEntry(
+                skill_id=skill_id,
+                name=skill.name,
+                description=skill.description,
+                version=skill.version,
+                category=skill.category,
+                tags=skill.tags,
+                file_path=str(skill_file),
+                directory=str(skill_dir),
+                source="generated",
+                source_recording_id=skill.source_recording_id,
+            )
+
+            self._put_entry(entry)
+            self._save_index()
 
-        return entry
+            return entry
 
     def get_skill(self, skill_id: str) -> Optional[SkillEntry]:
         """获取 Skill"""
         entry = self._entries.get(skill_id)
-        if entry and not entry.content:
-            # 懒加载内容
-            if entry.file_path and os.path.exists(entry.file_path):
+        if entry and not entry.content and entry.file_path:
+            # 懒加载内容（直接读取，文件缺失时跳过，省去一次 stat）
+            try:
                 entry.content = Path(entry.file_path).read_text(encoding='utf-8')
+            except FileNotFoundError:
+                pass
         return entry
 
     def list_skills(
@@ -268,17 +567,23 @@ class KnowledgeRepository:
         source: str = None
     ) -> List[SkillEntry]:
         """列出 Skills"""
-        entries = list(self._entries.values())
+        import numpy as np
+
+        with self._lock:
+            n = self._next_seq
+            mask = self._live[:n].copy()
 
-        if category:
-            entries = [e for e in entries if e.category == category]
+            if category:
+                mask &= self._cat[:n] == category
+
+            if source:
+                mask &= self._src[:n] == source
+
+            entries = [self._entries[self._ids[row]] for row in np.flatnonzero(mask)]
 
         if tags:
             entries = [e for e in entries if any(t in e.tags for t in tags)]
 
-        if source:
-            entries = [e for e in entries if e.source == source]
-
         return sorted(entries, key=lambda e: e.name)
 
     def search(
@@ -289,12 +594,12 @@ class KnowledgeRepository:
         """
         搜索 Skills
 
-        简单的文本匹配搜索，后续可以扩展为向量搜索
+        子串匹配搜索：先用 3-gram 倒排索引筛选候选，再逐字段确认并打分
         """
         query_lower = query.lower()
         results = []
 
-        for entry in self._entries.values():
+        for entry in self._search_candidates(query_lower):
             score = 0.0
             matched_fields = []
 
@@ -332,20 +637,20 @@ class KnowledgeRepository:
 
     def delete_skill(self, skill_id: str) -> bool:
         """删除 Skill"""
-        entry = self._entries.get(skill_id)
-        if not entry:
-            return False
+        with self._lock:
+            entry = self._entries.get(skill_id)
+            if not entry:
+                return False
 
-        # 删除文件
-        if entry.directory and os.path.exists(entry.directory):
-            import shutil
-            shutil.rmtree(entry.directory)
+            # 删除文件（目录不存在时忽略）
+            if entry.directory:
+                shutil.rmtree(entry.directory, ignore_errors=True)
 
-        # 从索引移除
-        del self._entries[skill_id]
-        self._save_index()
+            # 从索引移除
+            self._drop_entry(skill_id)
+            self._save_index()
 
-        return True
+            return True
 
     def update_stats(
         self,
@@ -353,54 +658,70 @@ class KnowledgeRepository:
         success: bool,
         duration_ms: float
     ):
-        """更新执行统计"""
-        entry = self._entries.get(skill_id)
-        if entry:
-            entry.execution_count += 1
-
-            # 更新成功率（滑动平均）
-            if entry.execution_count == 1:
-                entry.success_rate = 1.0 if success else 0.0
-            else:
-                alpha = 0.1
-                entry.success_rate = alpha * (1.0 if success else 0.0) + (1 - alpha) * entry.success_rate
-
-            # 更新平均耗时
-            if entry.avg_duration_ms == 0:
-                entry.avg_duration_ms = duration_ms
-            else:
-                entry.avg_duration_ms = 0.9 * entry.avg_duration_ms + 0.1 * duration_ms
-
-            entry.updated_at = datetime.utcnow()
-            self._save_index()
-
-    def get_stats(self) -> Dict[str, Any]:
-        """获取知识库统计"""
-        entries = list(self._entries.values())
+        """更新执行统计（只追加一条增量日志，不重写整个索引）"""
+        with self._lock:
+            entry = self._entries.get(skill_id)
+            if entry:
+                now = datetime.utcnow()
+                self._apply_stats(entry, success, duration_ms, now)
+                self._put_columns(entry)
+                self._append_wal({"skill_id": skill_id, "ok": success, "ms": duration_ms, "t": now})
+
+    @staticmethod
+    def _apply_stats(
+        entry: SkillEntry,
+        success: bool,
+        duration_ms: float,
+        timestamp: datetime
+    ):
+        """把一次执行结果计入条目统计"""
+        entry.execution_count += 1
 
-        return {
-            "total_skills": len(entries),
-            "by_category": self._group_count(entries, lambda e: e.category or "未分类"),
-            "by_source": self._group_count(entries, lambda e: e.source),
-            "total_executions": sum(e.execution_count for e in entries),
-            "avg_success_rate": (
-                sum(e.success_rate for e in entries if e.execution_count > 0) /
-                len([e for e in entries if e.execution_count > 0])
-                if any(e.execution_count > 0 for e in entries) else 0
-            ),
-        }
+        # 更新成功率（滑动平均）
+        if entry.execution_count == 1:
+            entry.success_rate = 1.0 if success else 0.0
+        else:
+            alpha = 0.1
+            entry.success_rate = alpha * (1.0 if success else 0.0) + (1 - alpha) * entry.success_rate
 
-    def _group_count(self, entries: List[SkillEntry], key_func) -> Dict[str, int]:
-        """分组计数"""
-        counts = {}
-        for entry in entries:
-            key = key_func(entry)
-            counts[key] = counts.get(key, 0) + 1
-        return counts
+        # 更新平均耗时
+        if entry.avg_duration_ms == 0:
+            entry.avg_duration_ms = duration_ms
+        else:
+            entry.avg_duration_ms = 0.9 * entry.avg_duration_ms + 0.1 * duration_ms
 
+        entry.updated_at = timestamp
 
-# 需要导入 re
-import re
+    def get_stats(self) -> Dict[str, Any]:
+        """获取知识库统计"""
+        with self._lock:
+            live = self._live[:self._next_seq]
+            executed = self._exec[:self._next_seq][live]
+            success_rates = self._sr[:self._next_seq][live][executed > 0]
+            # 无分类（""）与显式的"未分类"合并计数
+            by_category: Dict[str, int] = {}
+            for key, count in self._group_count(self._cat[:self._next_seq][live]).items():
+                key = key or "未分类"
+                by_category[key] = by_category.get(key, 0) + count
+
+            return {
+                "total_skills": len(self._entries),
+                "by_category": by_category,
+                "by_source": self._group_count(self._src[:self._next_seq][live]),
+                "total_executions": int(executed.sum()),
+                "avg_success_rate": float(success_rates.mean()) if len(success_rates) else 0,
+            }
+
+    @staticmethod
+    def _group_count(column: "np.ndarray") -> Dict[str, int]:
+        """分组计数（按首次出现的顺序）"""
+        import numpy as np
+
+        if not len(column):
+            return {}
+        keys, first, counts = np.unique(column, return_index=True, return_counts=True)
+        order = np.argsort(first)
+        return {keys[i]: int(counts[i]) for i in order}
 
 
 # 全局知识库实例
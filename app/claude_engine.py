@@ -3,16 +3,25 @@ Claude Skills 执行引擎
 接入 Claude API，支持真正的工具调用
 """
 import os
+import copy
 import uuid
 import time
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Generator
-from dataclasses import dataclass, field
+from typing import Optional, Callable, Generator, Iterator, NamedTuple
 
 from dotenv import load_dotenv
 import anthropic
+import httpx
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
 
 # Load .env file
 load_dotenv()
@@ -29,13 +38,54 @@ from .models import (
     ExecutionStep,
     SkillStatus,
 )
-from .skill_parser import SkillParser, SkillLoader, ParsedSkill, SkillMetadata
+from .skill_parser import SkillParser, SkillLoader, ParsedSkill, SkillMetadata, skill_content_hash
 from .tools import ToolExecutor, get_tool_definitions, ToolResult
 from .semantic_matcher import SemanticMatcher, KeywordMatcher, MatchResult
+from .response_cache import ResponseCache
+
+
+# 共享的 HTTP 连接池：所有引擎实例和工具调用循环中的多次请求复用长连接与 TLS 会话
+_http_client: Optional[anthropic.DefaultHttpxClient] = None
+
+
+def get_http_client() -> anthropic.DefaultHttpxClient:
+    """获取共享的 HTTP 客户端"""
+    global _http_client
+    if _http_client is None:
+        # DefaultHttpxClient 保留 SDK 自身的默认传输配置，只覆盖连接池参数
+        _http_client = anthropic.DefaultHttpxClient(
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_keepalive_connections=32,
+                max_connections=64,
+                keepalive_expiry=60.0,
+            ),
+            # 读超时与 SDK 默认值一致，长回复不会被提前截断；建连超时单独收紧
+            timeout=httpx.Timeout(600.0, connect=5.0),
+        )
+    return _http_client
+
+
+_json_encoder = json.JSONEncoder()
 
 
-@dataclass
-class SkillMatch:
+def _truncated_json(obj, limit: int = 200) -> str:
+    """
+    序列化为 JSON 并截断到 limit 个字符
+
+    增量编码，凑够 limit 个字符即停止，大体积的工具输入无需完整序列化
+    """
+    parts = []
+    size = 0
+    for chunk in _json_encoder.iterencode(obj):
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return "".join(parts)[:limit]
+
+
+class SkillMatch(NamedTuple):
     """技能匹配结果"""
     skill: ParsedSkill
     score: float
@@ -53,8 +103,18 @@ class ClaudeSkillsEngine:
     - 语义触发：自动匹配用户输入和 Skill
     - 渐进式加载：按需加载 Skill 内容
     - SKILL.md 格式：支持标准格式
+    - 响应缓存：只读 Skill 的相同输入在 TTL 内直接复用上次的 Claude 结果
     """
 
+    # SKILL.md 解析结果缓存容量
+    PARSE_CACHE_SIZE = 512
+
+    # 执行历史保留条数，超出后淘汰最早的记录
+    MAX_EXECUTIONS = 1000
+
+    # 同一轮回复中并行执行的只读工具调用数上限
+    MAX_TOOL_WORKERS = 8
+
     def __init__(
         self,
         skills_dir: str = None,
@@ -67,7 +127,11 @@ class ClaudeSkillsEngine:
         self.model = model
         self.client = None
         if self.api_key:
-            self.client = anthropic.Anthropic(api_key=self.api_key)
+            self.client = anthropic.Anthropic(
+                api_key=self.api_key,
+                http_client=get_http_client(),
+                max_retries=2,
+            )
 
         # 工作目录
         self.working_dir = working_dir or os.getcwd()
@@ -81,9 +145,20 @@ class ClaudeSkillsEngine:
         self.semantic_matcher = SemanticMatcher(backend="auto")
         self.keyword_matcher = KeywordMatcher()
 
-        # 内存存储（用于 Web UI 创建的 Skills）
+        # 内存存储（用于 Web UI 创建的 Skills 和示例 Skills）
+        # 元数据索引：名称 → (描述, 指令正文)，总是就绪；完整 ParsedSkill 在首次需要时才解析
+        self._memory_skill_meta: dict[str, tuple[str, str]] = {}
         self._memory_skills: dict[str, ParsedSkill] = {}
-        self._executions: dict[str, ExecutionResult] = {}
+        self._executions: OrderedDict[str, ExecutionResult] = OrderedDict()
+
+        # 解析结果缓存：(内容, 名称) → ParsedSkill，按插入顺序淘汰
+        self._parse_cache: dict[tuple[str, str], ParsedSkill] = {}
+
+        # 响应缓存：只读 Skill 的 (skill_id, 内容哈希, 输入) → 最终结果
+        self._responses = ResponseCache()
+
+        # 后台刷新线程与初始化都可能调用 _ensure_skills
+        self._ensure_lock = threading.Lock()
 
         # 初始化
         self._init_skills()
@@ -94,14 +169,21 @@ class ClaudeSkillsEngine:
         self.skills_dir.mkdir(parents=True, exist_ok=True)
 
         # Level 1: 加载所有 Skill 元数据
-        self.loader.load_all_metadata()
+        # 有快照时先用快照提供服务，后台重新扫描；否则同步扫描
+        if self.loader.load_snapshot():
+            self.loader.refresh_in_background(on_done=self._ensure_skills)
+        else:
+            self.loader.load_all_metadata()
+            self._ensure_skills()
 
-        # 如果没有文件系统 Skills，创建示例 Skills
-        if not self.loader.list_skills() and not self._memory_skills:
-            self._create_demo_skills()
+    def _ensure_skills(self):
+        """如果没有文件系统 Skills，创建示例 Skills"""
+        with self._ensure_lock:
+            if not self.loader.list_skills() and not self._memory_skill_meta:
+                self._create_demo_skills()
 
     def _create_demo_skills(self):
-        """创建示例 Skills"""
+        """登记示例 Skills（只记录元数据，首次使用时才解析）"""
         demo_skills = [
             {
                 "name": "file-reader",
@@ -185,49 +267,85 @@ Action: Stage changes and create a commit with a good message
         ]
 
         for skill_data in demo_skills:
+            self._memory_skill_meta[skill_data['name']] = (skill_data['description'], skill_data['content'])
+
+    def _memory_skill(self, name: str) -> Optional[ParsedSkill]:
+        """获取内存 Skill（首次访问时由元数据索引构建）"""
+        skill = self._memory_skills.get(name)
+        if skill is None and name in self._memory_skill_meta:
+            description, body = self._memory_skill_meta[name]
             content = f"""---
-name: {skill_data['name']}
-description: {skill_data['description']}
+name: {name}
+description: {description}
 ---
 
-{skill_data['content']}"""
+{body}"""
+            skill = self._cached_parse(content, name)
+            self._memory_skills[name] = skill
+        return skill
+
+    def _memory_skill_summary(self, name: str) -> tuple[str, str]:
+        """内存 Skill 的 (描述, 指令内容)；已解析的以解析结果为准（可能已被 update_skill 修改）"""
+        skill = self._memory_skills.get(name)
+        if skill is not None:
+            return skill.description, skill.instructions.content if skill.instructions else ""
+        description, body = self._memory_skill_meta[name]
+        return description, body.strip()
 
-            skill = self.parser.parse_content(content, skill_data['name'])
-            self._memory_skills[skill_data['name']] = skill
+    def _cached_parse(self, content: str, name: str) -> ParsedSkill:
+        """
+        解析 SKILL.md 内容（相同内容只解析一次）
+
+        命中时直接返回缓存对象（可能与其他 Skill 共享），调用方只读使用；
+        需要原地修改的 update_skill 先复制再改，因此缓存无需按内容失效
+        """
+        key = (content, name)
+        parsed = self._parse_cache.get(key)
+        if parsed is None:
+            parsed = self.parser.parse_content(content, name)
+            if len(self._parse_cache) >= self.PARSE_CACHE_SIZE:
+                del self._parse_cache[next(iter(self._parse_cache))]
+            self._parse_cache[key] = parsed
+        return parsed
 
     # ==================== Skill 管理 ====================
 
-    def get_all_skills(self) -> list[Skill]:
-        """获取所有 Skills（兼容旧 API）"""
-        skills = []
+    def iter_skills(self) -> Iterator[Skill]:
+        """
+        逐个生成所有 Skills
 
+        按需构造 Skill 对象，分页时配合 itertools.islice 只构造当前页
+        """
         # 文件系统 Skills
-        for name in self.loader.list_skills():
-            metadata = self.loader.get_metadata(name)
-            if metadata:
-                skills.append(Skill(
-                    id=name,
-                    name=name,
-                    description=metadata.description,
-                    prompt=f"[SKILL.md file at {self.skills_dir / name}]"
-                ))
+        for name, metadata in self.loader.get_all_metadata().items():
+            yield Skill(
+                id=name,
+                name=name,
+                description=metadata.description,
+                prompt=f"[SKILL.md file at {self.skills_dir / name}]"
+            )
 
-        # 内存 Skills
-        for name, skill in self._memory_skills.items():
-            skills.append(Skill(
+        # 内存 Skills（遍历快照，避免生成期间增删导致迭代出错）
+        for name in list(self._memory_skill_meta):
+            if name not in self._memory_skill_meta:
+                continue
+            description, prompt = self._memory_skill_summary(name)
+            yield Skill(
                 id=name,
                 name=name,
-                description=skill.description,
-                prompt=skill.instructions.content if skill.instructions else ""
-            ))
+                description=description,
+                prompt=prompt
+            )
 
-        return skills
+    def get_all_skills(self) -> list[Skill]:
+        """获取所有 Skills（兼容旧 API）"""
+        return list(self.iter_skills())
 
     def get_skill(self, skill_id: str) -> Optional[Skill]:
         """获取单个 Skill"""
         # 先检查内存
-        if skill_id in self._memory_skills:
-            skill = self._memory_skills[skill_id]
+        if skill_id in self._memory_skill_meta:
+            skill = self._memory_skill(skill_id)
             return Skill(
                 id=skill_id,
                 name=skill.name,
@@ -257,8 +375,10 @@ description: {skill_data.description}
 
 {skill_data.prompt}
 """
-        skill = self.parser.parse_content(content, skill_data.name)
+        skill = self._cached_parse(content, skill_data.name)
+        self._memory_skill_meta[skill_data.name] = (skill_data.description, skill_data.prompt)
         self._memory_skills[skill_data.name] = skill
+        self._responses.invalidate(skill_data.name)
 
         return Skill(
             id=skill_data.name,
@@ -269,25 +389,42 @@ description: {skill_data.description}
 
     def update_skill(self, skill_id: str, update_data: SkillUpdate) -> Optional[Skill]:
         """更新 Skill"""
-        if skill_id not in self._memory_skills:
+        if skill_id not in self._memory_skill_meta:
             return None
 
-        skill = self._memory_skills[skill_id]
+        skill = self._memory_skill(skill_id)
+
+        # 内容未变化（如 Web UI 重复提交）时直接返回，保留响应缓存
+        prompt = skill.instructions.content if skill.instructions else ""
+        if update_data.prompt is not None and skill.instructions:
+            prompt = update_data.prompt
+        new_hash = skill_content_hash(
+            update_data.name if update_data.name is not None else skill.metadata.name,
+            update_data.description if update_data.description is not None else skill.metadata.description,
+            prompt,
+        )
+        if new_hash == skill.content_hash:
+            return self.get_skill(skill_id)
 
-        # 更新元数据
+        # 更新元数据（解析结果可能与解析缓存共享，先复制再修改）
+        skill = copy.deepcopy(skill)
+        self._memory_skills[skill_id] = skill
         if update_data.name is not None:
             skill.metadata.name = update_data.name
         if update_data.description is not None:
             skill.metadata.description = update_data.description
         if update_data.prompt is not None and skill.instructions:
             skill.instructions.content = update_data.prompt
+        self._responses.invalidate(skill_id)
 
         return self.get_skill(skill_id)
 
     def delete_skill(self, skill_id: str) -> bool:
         """删除 Skill"""
-        if skill_id in self._memory_skills:
-            del self._memory_skills[skill_id]
+        if skill_id in self._memory_skill_meta:
+            del self._memory_skill_meta[skill_id]
+            self._memory_skills.pop(skill_id, None)
+            self._responses.invalidate(skill_id)
             return True
         return False
 
@@ -305,24 +442,21 @@ description: {skill_data.description}
             匹配的 Skills 列表
         """
         # 收集所有 Skill 的元数据
-        skill_list = []
-
-        for name in self.loader.list_skills():
-            metadata = self.loader.get_metadata(name)
-            if metadata:
-                skill_list.append((name, metadata.description))
+        skill_list = [
+            (name, metadata.description)
+            for name, metadata in self.loader.get_all_metadata().items()
+        ]
 
-        for name, skill in self._memory_skills.items():
-            skill_list.append((name, skill.description))
+        for name in self._memory_skill_meta:
+            skill_list.append((name, self._memory_skill_summary(name)[0]))
 
         if not skill_list:
             return []
 
-        # 1. 先用关键词快速筛选
-        keyword_results = self.keyword_matcher.quick_match(query, skill_list)
+        # 1. 先用关键词快速筛选出前 N 个候选
+        candidates = self.keyword_matcher.quick_match(query, skill_list, limit=10)
 
-        # 2. 对前 N 个候选进行语义匹配
-        candidates = keyword_results[:min(10, len(keyword_results))]
+        # 2. 对候选进行语义匹配
         semantic_results = self.semantic_matcher.match(
             query,
             [(name, desc) for name, desc, _ in candidates],
@@ -346,8 +480,8 @@ description: {skill_data.description}
 
     def _load_full_skill(self, skill_name: str) -> Optional[ParsedSkill]:
         """加载完整 Skill（Level 2）"""
-        if skill_name in self._memory_skills:
-            return self._memory_skills[skill_name]
+        if skill_name in self._memory_skill_meta:
+            return self._memory_skill(skill_name)
         return self.loader.load_skill(skill_name)
 
     # ==================== 执行引擎 ====================
@@ -356,7 +490,8 @@ description: {skill_data.description}
         self,
         skill_id: str,
         args: Optional[str] = None,
-        stream: bool = False
+        stream: bool = False,
+        on_text: Optional[Callable[[str], None]] = None
     ) -> ExecutionResult:
         """
         执行 Skill
@@ -365,12 +500,14 @@ description: {skill_data.description}
             skill_id: Skill ID/名称
             args: 用户输入参数
             stream: 是否使用流式输出
+            on_text: 流式输出时每收到一段文本调用一次（在执行线程中同步调用）
 
         Returns:
             执行结果
         """
         execution_id = str(uuid.uuid4())[:8]
-        started_at = datetime.now()
+        started_at = datetime.now()  # 仅用于展示，耗时用单调时钟计算
+        mono_start = time.monotonic_ns()
 
         # 创建执行结果
         result = ExecutionResult(
@@ -394,23 +531,41 @@ description: {skill_data.description}
         # 获取允许的工具
         allowed_tools = skill.metadata.allowed_tools if skill.metadata.allowed_tools else None
 
-        # 如果有 Claude API，使用 Claude 执行
+        # 如果有 Claude API，使用 Claude 执行（只读 Skill 先查响应缓存）
         if self.client:
-            try:
-                result = self._execute_with_claude(
-                    skill, args, result, allowed_tools
-                )
-            except Exception as e:
-                result.status = SkillStatus.ERROR
-                result.error = f"Claude API error: {str(e)}"
+            cacheable = ResponseCache.is_cacheable(allowed_tools)
+            cached = self._responses.get(skill_id, skill.content_hash, args) if cacheable else None
+            if cached is not None:
+                result.steps.append(ExecutionStep(
+                    step_id=1,
+                    action="cache hit",
+                    detail="Reused a previous Claude response for an identical input",
+                    status=SkillStatus.SUCCESS,
+                    duration_ms=0,
+                ))
+                result.final_result = cached
+                result.status = SkillStatus.SUCCESS
+            else:
+                try:
+                    result = self._execute_with_claude(
+                        skill, args, result, allowed_tools, stream=stream, on_text=on_text
+                    )
+                except Exception as e:
+                    result.status = SkillStatus.ERROR
+                    result.error = f"Claude API error: {str(e)}"
+
+                if cacheable and result.status == SkillStatus.SUCCESS and result.final_result:
+                    self._responses.put(skill_id, skill.content_hash, args, result.final_result)
         else:
             # 回退到简单执行
             result = self._execute_simple(skill, args, result)
 
         result.completed_at = datetime.now()
-        result.total_duration_ms = (result.completed_at - started_at).total_seconds() * 1000
+        result.total_duration_ms = (time.monotonic_ns() - mono_start) / 1e6
 
         self._executions[execution_id] = result
+        if len(self._executions) > self.MAX_EXECUTIONS:
+            self._executions.popitem(last=False)
         return result
 
     def _execute_with_claude(
@@ -418,9 +573,15 @@ description: {skill_data.description}
         skill: ParsedSkill,
         user_input: Optional[str],
         result: ExecutionResult,
-        allowed_tools: list[str] = None
+        allowed_tools: list[str] = None,
+        stream: bool = False,
+        on_text: Optional[Callable[[str], None]] = None
     ) -> ExecutionResult:
-        """使用 Claude API 执行 Skill"""
+        """
+        使用 Claude API 执行 Skill
+
+        stream=True 时使用流式接口，生成中的文本逐段交给 on_text，同时写入当前步骤的 detail
+        """
         # 构建系统提示
         system_prompt = f"""You are executing a skill called "{skill.name}".
 
@@ -447,7 +608,7 @@ Be concise and focused on completing the task."""
 
         while True:
             step_id += 1
-            step_start = time.time()
+            step_start = time.monotonic_ns()
 
             # 添加执行步骤
             step = ExecutionStep(
@@ -459,15 +620,28 @@ Be concise and focused on completing the task."""
             result.steps.append(step)
 
             # 调用 Claude
-            response = self.client.messages.create(
+            request = dict(
                 model=skill.metadata.model or self.model,
                 max_tokens=4096,
                 system=system_prompt,
                 tools=tools if tools else None,
                 messages=messages
             )
+            if stream:
+                with self.client.messages.stream(**request) as response_stream:
+                    # detail 只展示前 200 个字符，够长后不再拼接
+                    partial = ""
+                    for text in response_stream.text_stream:
+                        if on_text is not None:
+                            on_text(text)
+                        if len(partial) < 200:
+                            partial += text
+                            step.detail = partial[:200]
+                    response = response_stream.get_final_message()
+            else:
+                response = self.client.messages.create(**request)
 
-            step.duration_ms = (time.time() - step_start) * 1000
+            step.duration_ms = (time.monotonic_ns() - step_start) / 1e6
 
             # 处理响应
             if response.stop_reason == "end_turn":
@@ -490,38 +664,40 @@ Be concise and focused on completing the task."""
                 assistant_message = {"role": "assistant", "content": response.content}
                 messages.append(assistant_message)
 
+                # 连续的只读工具调用并行执行，bash/write 按顺序执行；结果按原顺序记录
+                tool_blocks = [block for block in response.content if block.type == "tool_use"]
+                outputs = tool_executor.execute_many(
+                    [(block.name, block.input) for block in tool_blocks],
+                    max_workers=self.MAX_TOOL_WORKERS
+                )
+
                 tool_results = []
-                for block in response.content:
-                    if block.type == "tool_use":
-                        tool_name = block.name
-                        tool_input = block.input
-
-                        step.action = f"Tool: {tool_name}"
-                        step.detail = json.dumps(tool_input)[:200]
-
-                        # 执行工具
-                        tool_result = tool_executor.execute(tool_name, tool_input)
-
-                        step.result = tool_result.output[:500] if tool_result.output else tool_result.error
-                        step.status = SkillStatus.SUCCESS if tool_result.success else SkillStatus.ERROR
-
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": tool_result.output if tool_result.success else f"Error: {tool_result.error}"
-                        })
-
-                        # 添加新步骤记录工具结果
-                        step_id += 1
-                        tool_step = ExecutionStep(
-                            step_id=step_id,
-                            action=f"Tool result: {tool_name}",
-                            detail=tool_result.output[:200] if tool_result.output else "",
-                            status=SkillStatus.SUCCESS if tool_result.success else SkillStatus.ERROR,
-                            result=tool_result.output[:500] if tool_result.output else tool_result.error,
-                            duration_ms=tool_result.duration_ms
-                        )
-                        result.steps.append(tool_step)
+                for block, tool_result in zip(tool_blocks, outputs):
+                    tool_name = block.name
+
+                    step.action = f"Tool: {tool_name}"
+                    step.detail = _truncated_json(block.input)
+
+                    step.result = tool_result.output[:500] if tool_result.output else tool_result.error
+                    step.status = SkillStatus.SUCCESS if tool_result.success else SkillStatus.ERROR
+
+                    tool_results.append({
+                        "type": "tool_result",
+                        "tool_use_id": block.id,
+                        "content": tool_result.output if tool_result.success else f"Error: {tool_result.error}"
+                    })
+
+                    # 添加新步骤记录工具结果
+                    step_id += 1
+                    tool_step = ExecutionStep(
+                        step_id=step_id,
+                        action=f"Tool result: {tool_name}",
+                        detail=tool_result.output[:200] if tool_result.output else "",
+                        status=SkillStatus.SUCCESS if tool_result.success else SkillStatus.ERROR,
+                        result=tool_result.output[:500] if tool_result.output else tool_result.error,
+                        duration_ms=tool_result.duration_ms
+                    )
+                    result.steps.append(tool_step)
 
                 messages.append({"role": "user", "content": tool_results})
 
@@ -556,12 +732,14 @@ Be concise and focused on completing the task."""
         )
         result.steps.append(step)
 
-        # 模拟执行
-        time.sleep(0.1)
+        # 模拟耗时（默认关闭，设置 SKILLS_SIMULATE_DELAY=<秒> 开启）
+        delay = float(os.environ.get("SKILLS_SIMULATE_DELAY") or 0)
+        if delay:
+            time.sleep(delay)
 
         step.status = SkillStatus.SUCCESS
         step.result = f"Skill '{skill.name}' executed with input: {user_input or 'none'}"
-        step.duration_ms = 100
+        step.duration_ms = delay * 1000
 
         result.final_result = f"""Skill: {skill.name}
 Description: {skill.description}
@@ -1,5 +1,8 @@
+import os
 import uuid
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
@@ -13,15 +16,25 @@ class SkillExecutor:
     技能执行器 - 负责技能的执行逻辑
     """
 
+    # 步骤解析缓存容量
+    PARSE_CACHE_SIZE = 256
+
+    # 执行历史保留条数，超出后淘汰最早的记录
+    MAX_EXECUTIONS = 1000
+
     def __init__(self):
-        self.executions: dict[str, ExecutionResult] = {}
+        self.executions: OrderedDict[str, ExecutionResult] = OrderedDict()
         self.parser = StepParser()
         self.simulator = SystemSimulator()
 
+        # prompt → 执行批次；以 prompt 内容为键，Skill 更新后自然不再命中旧结果
+        self._parse_cache: dict[str, list[tuple[set[int], list[tuple[int, str]]]]] = {}
+
     def execute(self, skill: Skill, args: Optional[str] = None) -> ExecutionResult:
         """执行技能"""
         execution_id = str(uuid.uuid4())[:8]
-        started_at = datetime.now()
+        started_at = datetime.now()  # 仅用于展示，耗时用单调时钟计算
+        mono_start = time.monotonic_ns()
 
         result = ExecutionResult(
             execution_id=execution_id,
@@ -34,12 +47,22 @@ class SkillExecutor:
             requires_approval=skill.requires_approval,
         )
 
-        steps = self.parser.parse(skill.prompt)
+        waves = self._get_waves(skill.prompt)
 
         try:
-            for i, step_desc in enumerate(steps):
-                step = self._execute_step(skill, i, step_desc, args)
-                result.steps.append(step)
+            for _, wave in waves:
+                if len(wave) == 1:
+                    result.steps.append(self._execute_step(skill, wave[0][0], wave[0][1], args))
+                    continue
+
+                # 只有多步骤批次才需要线程池，按批次大小创建
+                with ThreadPoolExecutor(max_workers=len(wave)) as pool:
+                    wave_steps = pool.map(
+                        lambda item: self._execute_step(skill, item[0], item[1], args), wave
+                    )
+                    # 按步骤顺序记录（map 按提交顺序返回，遇到异常时之前的步骤已记录）
+                    for step in wave_steps:
+                        result.steps.append(step)
 
             # 生成最终结果
             result.final_result = self.simulator.get_final_result(skill.name, args)
@@ -58,16 +81,29 @@ class SkillExecutor:
                 result.steps[-1].status = SkillStatus.ERROR
 
         result.completed_at = datetime.now()
-        result.total_duration_ms = (result.completed_at - started_at).total_seconds() * 1000
+        result.total_duration_ms = (time.monotonic_ns() - mono_start) / 1e6
 
         self.executions[execution_id] = result
+        if len(self.executions) > self.MAX_EXECUTIONS:
+            self.executions.popitem(last=False)
         return result
 
+    def _get_waves(self, prompt: str) -> list[tuple[set[int], list[tuple[int, str]]]]:
+        """解析执行批次（带缓存），批次内并行、批次间按顺序执行"""
+        waves = self._parse_cache.get(prompt)
+        if waves is None:
+            waves = self.parser.parse_waves(prompt)
+
+            if len(self._parse_cache) >= self.PARSE_CACHE_SIZE:
+                del self._parse_cache[next(iter(self._parse_cache))]
+            self._parse_cache[prompt] = waves
+        return waves
+
     def _execute_step(
         self, skill: Skill, step_idx: int, step_desc: str, args: Optional[str]
     ) -> ExecutionStep:
         """执行单个步骤"""
-        step_start = time.time()
+        step_start = time.monotonic_ns()
 
         step = ExecutionStep(
             step_id=step_idx + 1,
@@ -82,13 +118,15 @@ class SkillExecutor:
         )
         step.system_operations = system_ops
 
-        # 模拟步骤执行
-        time.sleep(0.05)
+        # 模拟步骤耗时（默认关闭，设置 SKILLS_SIMULATE_DELAY=<秒> 开启）
+        delay = os.environ.get("SKILLS_SIMULATE_DELAY")
+        if delay:
+            time.sleep(float(delay))
         step_result = self.simulator.get_step_result(skill.name, step_idx, args)
 
         step.status = SkillStatus.SUCCESS
         step.result = step_result
-        step.duration_ms = (time.time() - step_start) * 1000
+        step.duration_ms = (time.monotonic_ns() - step_start) / 1e6
         step.detail = f"已完成: {step_desc}"
 
         # 更新系统操作状态
@@ -4,11 +4,15 @@
 监控指标，触发告警
 """
 
+from collections import Counter
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any, Callable
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Any, Callable
 from enum import Enum
+import operator as _operator
+import queue
 import threading
+import time
 
 
 class AlertLevel(str, Enum):
@@ -27,6 +31,21 @@ class AlertStatus(str, Enum):
     SILENCED = "silenced"   # 已静默
 
 
+def _never(value: float, threshold: float) -> bool:
+    """未知比较运算符：永不触发"""
+    return False
+
+
+# 比较运算符 → (比较函数, 告警消息中的描述)
+_OPERATORS: Dict[str, Tuple[Callable[[float, float], bool], str]] = {
+    "lt": (_operator.lt, "低于"),
+    "gt": (_operator.gt, "超过"),
+    "eq": (_operator.eq, "等于"),
+    "lte": (_operator.le, "不超过"),
+    "gte": (_operator.ge, "不低于"),
+}
+
+
 @dataclass
 class AlertRule:
     """告警规则"""
@@ -55,6 +74,15 @@ class AlertRule:
     # 是否启用
     enabled: bool = True
 
+    # 创建时按 operator 解析出的比较函数与描述
+    _cmp: Callable[[float, float], bool] = field(default=_never, init=False, repr=False, compare=False)
+    _op_text: str = field(default="", init=False, repr=False, compare=False)
+    _cooldown_seconds: float = field(default=0.0, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._cmp, self._op_text = _OPERATORS.get(self.operator, (_never, self.operator))
+        self._cooldown_seconds = self.cooldown_minutes * 60
+
 
 @dataclass
 class Alert:
@@ -101,10 +129,22 @@ class AlertManager:
 
     def __init__(self):
         self._rules: Dict[str, AlertRule] = {}
+        # (metric_type, metric_scope) → 规则列表，保持规则注册顺序
+        self._rule_index: Dict[Tuple[str, str], List[AlertRule]] = {}
+        # "rule_id:target_id" → 告警
         self._alerts: Dict[str, Alert] = {}
+        # alert_id → 告警
+        self._alerts_by_id: Dict[str, Alert] = {}
+        # "rule_id:target_id" → 活跃告警，状态离开 ACTIVE 时移除
+        self._active_alerts: Dict[str, Alert] = {}
         self._handlers: List[Callable[[Alert], None]] = []
         self._lock = threading.Lock()
-        self._last_check: Dict[str, datetime] = {}
+
+        # 通知队列：处理器在后台线程中调用，慢处理器不阻塞指标检查
+        self._notify_q: "queue.Queue[Alert]" = queue.Queue()
+        self._notify_thread: Optional[threading.Thread] = None
+        # "rule_id:target_id" → 上次触发的单调时钟时间（秒），用于冷却判断
+        self._last_check: Dict[str, float] = {}
 
         # 注册默认规则
         self._register_default_rules()
@@ -164,16 +204,26 @@ class AlertManager:
 
         for rule in default_rules:
             self._rules[rule.rule_id] = rule
+        self._rebuild_rule_index()
+
+    def _rebuild_rule_index(self):
+        """重建规则索引（整体替换，检查中的遍历不受影响）"""
+        index: Dict[Tuple[str, str], List[AlertRule]] = {}
+        for rule in self._rules.values():
+            index.setdefault((rule.metric_type, rule.metric_scope), []).append(rule)
+        self._rule_index = index
 
     def add_rule(self, rule: AlertRule):
         """添加告警规则"""
         with self._lock:
             self._rules[rule.rule_id] = rule
+            self._rebuild_rule_index()
 
     def remove_rule(self, rule_id: str):
         """移除告警规则"""
         with self._lock:
-            self._rules.pop(rule_id, None)
+            if self._rules.pop(rule_id, None) is not None:
+                self._rebuild_rule_index()
 
     def get_rules(self) -> List[AlertRule]:
         """获取所有规则"""
@@ -197,17 +247,14 @@ class AlertManager:
             target_id: 目标 ID
             sample_count: 样本数量
         """
-        now = datetime.utcnow()
+        now = time.monotonic()
 
-        for rule_id, rule in self._rules.items():
+        for rule in self._rule_index.get((metric_type, metric_scope), ()):
             if not rule.enabled:
                 continue
 
             # 匹配规则
-            if rule.metric_type != metric_type:
-                continue
-            if rule.metric_scope != metric_scope:
-                continue
+            rule_id = rule.rule_id
             if rule.target_id and rule.target_id != target_id:
                 continue
 
@@ -216,33 +263,24 @@ class AlertManager:
                 continue
 
             # 检查冷却时间
-            last_check_key = f"{rule_id}:{target_id or 'all'}"
-            last_check = self._last_check.get(last_check_key)
-            if last_check and (now - last_check) < timedelta(minutes=rule.cooldown_minutes):
+            alert_key = f"{rule_id}:{target_id or 'all'}"
+            last_check = self._last_check.get(alert_key)
+            if last_check is not None and (now - last_check) < rule._cooldown_seconds:
                 continue
 
             # 评估条件
-            triggered = self._evaluate_condition(value, rule.threshold, rule.operator)
+            triggered = rule._cmp(value, rule.threshold)
 
             if triggered:
                 self._trigger_alert(rule, value, target_id)
-                self._last_check[last_check_key] = now
-            elif rule.auto_resolve:
+                self._last_check[alert_key] = now
+            elif rule.auto_resolve and alert_key in self._active_alerts:
+                # 没有活跃告警时无需加锁查找
                 self._resolve_alert_for_rule(rule_id, target_id)
 
     def _evaluate_condition(self, value: float, threshold: float, operator: str) -> bool:
         """评估条件"""
-        if operator == "lt":
-            return value < threshold
-        elif operator == "gt":
-            return value > threshold
-        elif operator == "eq":
-            return value == threshold
-        elif operator == "lte":
-            return value <= threshold
-        elif operator == "gte":
-            return value >= threshold
-        return False
+        return _OPERATORS.get(operator, (_never,))[0](value, threshold)
 
     def _trigger_alert(
         self,
@@ -282,14 +320,32 @@ class AlertManager:
                 }
             )
 
+            if existing:
+                self._alerts_by_id.pop(existing.alert_id, None)
             self._alerts[alert_key] = alert
+            self._alerts_by_id[alert.alert_id] = alert
+            self._active_alerts[alert_key] = alert
+
+        # 通知处理器（后台执行）
+        if self._handlers:
+            self._notify_q.put(alert)
 
-        # 通知处理器
-        for handler in self._handlers:
+    def _notify_worker(self):
+        """后台通知线程：依次把告警交给所有处理器"""
+        while True:
+            alert = self._notify_q.get()
             try:
-                handler(alert)
-            except Exception:
-                pass
+                for handler in list(self._handlers):
+                    try:
+                        handler(alert)
+                    except Exception:
+                        pass
+            finally:
+                self._notify_q.task_done()
+
+    def flush_notifications(self):
+        """等待已触发告警的通知全部处理完"""
+        self._notify_q.join()
 
     def _format_alert_message(
         self,
@@ -299,13 +355,7 @@ class AlertManager:
     ) -> str:
         """格式化告警消息"""
         target_str = f" ({target_id})" if target_id else ""
-        op_str = {
-            "lt": "低于",
-            "gt": "超过",
-            "eq": "等于",
-            "lte": "不超过",
-            "gte": "不低于",
-        }.get(rule.operator, rule.operator)
+        op_str = rule._op_text
 
         if rule.metric_type == "success_rate":
             return f"{rule.metric_scope}{target_str} 成功率 {value:.1%} {op_str}阈值 {rule.threshold:.1%}"
@@ -314,6 +364,11 @@ class AlertManager:
         else:
             return f"{rule.metric_scope}{target_str} {rule.metric_type} = {value} {op_str}阈值 {rule.threshold}"
 
+    @staticmethod
+    def _alert_key(alert: Alert) -> str:
+        """告警在 _alerts / _active_alerts 中的键"""
+        return f"{alert.rule_id}:{alert.target_id or 'all'}"
+
     def _resolve_alert_for_rule(self, rule_id: str, target_id: str = None):
         """解决规则相关的告警"""
         alert_key = f"{rule_id}:{target_id or 'all'}"
@@ -322,47 +377,48 @@ class AlertManager:
             alert = self._alerts.get(alert_key)
             if alert and alert.status == AlertStatus.ACTIVE:
                 alert.status = AlertStatus.RESOLVED
-                alert.resolved_at = datetime.utcnow()
-                alert.last_updated = datetime.utcnow()
+                alert.resolved_at = alert.last_updated = datetime.utcnow()
+                self._active_alerts.pop(alert_key, None)
 
     def acknowledge(self, alert_id: str, user: str) -> bool:
         """确认告警"""
         with self._lock:
-            for alert in self._alerts.values():
-                if alert.alert_id == alert_id:
-                    alert.status = AlertStatus.ACKNOWLEDGED
-                    alert.acknowledged_by = user
-                    alert.acknowledged_at = datetime.utcnow()
-                    alert.last_updated = datetime.utcnow()
-                    return True
-        return False
+            alert = self._alerts_by_id.get(alert_id)
+            if alert is None:
+                return False
+            alert.status = AlertStatus.ACKNOWLEDGED
+            self._active_alerts.pop(self._alert_key(alert), None)
+            alert.acknowledged_by = user
+            alert.acknowledged_at = alert.last_updated = datetime.utcnow()
+            return True
 
     def resolve(self, alert_id: str) -> bool:
         """解决告警"""
         with self._lock:
-            for alert in self._alerts.values():
-                if alert.alert_id == alert_id:
-                    alert.status = AlertStatus.RESOLVED
-                    alert.resolved_at = datetime.utcnow()
-                    alert.last_updated = datetime.utcnow()
-                    return True
-        return False
+            alert = self._alerts_by_id.get(alert_id)
+            if alert is None:
+                return False
+            alert.status = AlertStatus.RESOLVED
+            self._active_alerts.pop(self._alert_key(alert), None)
+            alert.resolved_at = alert.last_updated = datetime.utcnow()
+            return True
 
     def silence(self, alert_id: str, duration_minutes: int = 60) -> bool:
         """静默告警"""
         with self._lock:
-            for alert in self._alerts.values():
-                if alert.alert_id == alert_id:
-                    alert.status = AlertStatus.SILENCED
-                    alert.last_updated = datetime.utcnow()
-                    # TODO: 设置自动恢复定时器
-                    return True
-        return False
+            alert = self._alerts_by_id.get(alert_id)
+            if alert is None:
+                return False
+            alert.status = AlertStatus.SILENCED
+            self._active_alerts.pop(self._alert_key(alert), None)
+            alert.last_updated = datetime.utcnow()
+            # TODO: 设置自动恢复定时器
+            return True
 
     def get_active_alerts(self, level: AlertLevel = None) -> List[Alert]:
         """获取活跃告警"""
         with self._lock:
-            alerts = [a for a in self._alerts.values() if a.status == AlertStatus.ACTIVE]
+            alerts = list(self._active_alerts.values())
 
         if level:
             alerts = [a for a in alerts if a.level == level]
@@ -388,22 +444,36 @@ class AlertManager:
 
     def add_handler(self, handler: Callable[[Alert], None]):
         """添加告警处理器"""
-        self._handlers.append(handler)
+        with self._lock:
+            self._handlers.append(handler)
+            if self._notify_thread is None:
+                self._notify_thread = threading.Thread(
+                    target=self._notify_worker, name="alert-notify", daemon=True
+                )
+                self._notify_thread.start()
 
     def get_alert_summary(self) -> Dict[str, Any]:
         """获取告警摘要"""
         alerts = self.get_all_alerts(limit=1000)
 
+        # 一次遍历同时统计状态和活跃告警的级别
+        status_counts: Counter = Counter()
+        level_counts: Counter = Counter()
+        for a in alerts:
+            status_counts[a.status] += 1
+            if a.status == AlertStatus.ACTIVE:
+                level_counts[a.level] += 1
+
         return {
             "total": len(alerts),
-            "active": len([a for a in alerts if a.status == AlertStatus.ACTIVE]),
-            "acknowledged": len([a for a in alerts if a.status == AlertStatus.ACKNOWLEDGED]),
-            "resolved": len([a for a in alerts if a.status == AlertStatus.RESOLVED]),
+            "active": status_counts[AlertStatus.ACTIVE],
+            "acknowledged": status_counts[AlertStatus.ACKNOWLEDGED],
+            "resolved": status_counts[AlertStatus.RESOLVED],
             "by_level": {
-                "emergency": len([a for a in alerts if a.level == AlertLevel.EMERGENCY and a.status == AlertStatus.ACTIVE]),
-                "critical": len([a for a in alerts if a.level == AlertLevel.CRITICAL and a.status == AlertStatus.ACTIVE]),
-                "warning": len([a for a in alerts if a.level == AlertLevel.WARNING and a.status == AlertStatus.ACTIVE]),
-                "info": len([a for a in alerts if a.level == AlertLevel.INFO and a.status == AlertStatus.ACTIVE]),
+                "emergency": level_counts[AlertLevel.EMERGENCY],
+                "critical": level_counts[AlertLevel.CRITICAL],
+                "warning": level_counts[AlertLevel.WARNING],
+                "info": level_counts[AlertLevel.INFO],
             }
         }
 
@@ -5,10 +5,12 @@
 """
 
 import uuid
+from collections import deque
 from datetime import datetime
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Deque, Iterator, Tuple
 from enum import Enum
+import queue
 import threading
 import json
 
@@ -94,12 +96,20 @@ class AuditEvent:
     # 时间戳
     timestamp: datetime = field(default_factory=datetime.utcnow)
 
+    # 创建时缓存的枚举值，导出时无需逐条解析
+    _type_value: str = field(default="", init=False, repr=False, compare=False)
+    _category_value: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._type_value = self.event_type.value
+        self._category_value = self.event_category.value
+
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return {
             "event_id": self.event_id,
-            "event_type": self.event_type.value,
-            "event_category": self.event_category.value,
+            "event_type": self._type_value,
+            "event_category": self._category_value,
             "action": self.action,
             "target": self.target,
             "session_id": self.session_id,
@@ -152,13 +162,32 @@ class AuditLogger:
         AuditEventType.USER_LOGOUT: AuditEventCategory.USER,
     }
 
+    # 按同名字段导出到 AuditLog 表的属性
+    DB_EXPORT_FIELDS = (
+        "action", "session_id", "execution_id", "user_id", "target",
+        "details", "status", "error_message", "trace_id",
+        "user_name", "user_role", "ip_address", "source",
+    )
+
     def __init__(self, max_events: int = 10000):
+        if max_events < 1:
+            raise ValueError("max_events must be at least 1")
         self.max_events = max_events
-        self._events: List[AuditEvent] = []
+        # 超出 max_events 时自动淘汰最早的事件
+        self._events: Deque[AuditEvent] = deque(maxlen=max_events)
         self._lock = threading.Lock()
 
-        # 事件处理器（用于扩展）
+        # 按查询维度建立的二级索引：维度值 → 事件（与 _events 同序，随主缓冲区一起淘汰）
+        self._by_type: Dict[AuditEventType, Deque[AuditEvent]] = {}
+        self._by_category: Dict[AuditEventCategory, Deque[AuditEvent]] = {}
+        self._by_session: Dict[str, Deque[AuditEvent]] = {}
+        self._by_execution: Dict[str, Deque[AuditEvent]] = {}
+        self._by_user: Dict[str, Deque[AuditEvent]] = {}
+
+        # 事件处理器（用于扩展），在后台线程中调用
         self._handlers: List[callable] = []
+        self._handler_q: "queue.Queue[AuditEvent]" = queue.Queue()
+        self._handler_thread: Optional[threading.Thread] = None
 
     def log(
         self,
@@ -194,20 +223,58 @@ class AuditLogger:
         )
 
         with self._lock:
+            if len(self._events) == self.max_events:
+                self._unindex(self._events[0])
             self._events.append(event)
-            # 保持事件数量在限制内
-            if len(self._events) > self.max_events:
-                self._events = self._events[-self.max_events:]
+            for index, key in self._index_entries(event):
+                bucket = index.get(key)
+                if bucket is None:
+                    bucket = index[key] = deque()
+                bucket.append(event)
 
-        # 调用处理器
-        for handler in self._handlers:
-            try:
-                handler(event)
-            except Exception:
-                pass  # 处理器错误不影响主流程
+        # 调用处理器（后台执行）
+        if self._handlers:
+            self._handler_q.put(event)
 
         return event
 
+    def _handler_worker(self):
+        """后台处理线程：依次把事件交给所有处理器"""
+        while True:
+            event = self._handler_q.get()
+            try:
+                for handler in list(self._handlers):
+                    try:
+                        handler(event)
+                    except Exception:
+                        pass  # 处理器错误不影响主流程
+            finally:
+                self._handler_q.task_done()
+
+    def flush_handlers(self):
+        """等待已记录事件的处理器调用全部完成"""
+        self._handler_q.join()
+
+    def _index_entries(self, event: AuditEvent) -> Iterator[Tuple[Dict[Any, Deque[AuditEvent]], Any]]:
+        """事件所属的各二级索引及键（空值不建索引）"""
+        for index, key in (
+            (self._by_type, event.event_type),
+            (self._by_category, event.event_category),
+            (self._by_session, event.session_id),
+            (self._by_execution, event.execution_id),
+            (self._by_user, event.user_id),
+        ):
+            if key:
+                yield index, key
+
+    def _unindex(self, event: AuditEvent):
+        """从二级索引中移除即将被淘汰的事件（它总是各索引中最早的一条）"""
+        for index, key in self._index_entries(event):
+            bucket = index[key]
+            bucket.popleft()
+            if not bucket:
+                del index[key]
+
     def log_execution_start(
         self,
         execution_id: str,
@@ -306,7 +373,19 @@ class AuditLogger:
     ) -> List[AuditEvent]:
         """获取审计事件"""
         with self._lock:
-            events = list(self._events)
+            # 从命中最少的索引开始，再用其余条件过滤
+            candidates = [
+                index.get(key, ())
+                for index, key in (
+                    (self._by_type, event_type),
+                    (self._by_category, event_category),
+                    (self._by_session, session_id),
+                    (self._by_execution, execution_id),
+                    (self._by_user, user_id),
+                )
+                if key
+            ]
+            events = list(min(candidates, key=len) if candidates else self._events)
 
         if event_type:
             events = [e for e in events if e.event_type == event_type]
@@ -329,42 +408,46 @@ class AuditLogger:
         return self.get_events(session_id=session_id, limit=1000)
 
     def add_handler(self, handler: callable):
-        """添加事件处理器"""
-        self._handlers.append(handler)
+        """添加事件处理器（在后台线程中按记录顺序调用，需要等待结果时调用 flush_handlers）"""
+        with self._lock:
+            self._handlers.append(handler)
+            if self._handler_thread is None:
+                self._handler_thread = threading.Thread(
+                    target=self._handler_worker, name="audit-handlers", daemon=True
+                )
+                self._handler_thread.start()
 
     def export_to_db(self, session, events: List[AuditEvent] = None):
         """导出到数据库"""
         from ..storage.repository import AuditRepository
 
         repo = AuditRepository(session)
-        events = events or self._events
+        if not events:
+            with self._lock:
+                events = list(self._events)
 
+        fields = self.DB_EXPORT_FIELDS
+        rows = []
         for event in events:
-            repo.log(
-                event_type=event.event_type.value,
-                action=event.action,
-                session_id=event.session_id,
-                execution_id=event.execution_id,
-                user_id=event.user_id,
-                target=event.target,
-                details=event.details,
-                status=event.status,
-                error_message=event.error_message,
-                trace_id=event.trace_id,
-                event_category=event.event_category.value,
-                user_name=event.user_name,
-                user_role=event.user_role,
-                ip_address=event.ip_address,
-                source=event.source,
-            )
+            row = {name: getattr(event, name) for name in fields}
+            row["event_type"] = event._type_value
+            row["event_category"] = event._category_value
+            rows.append(row)
+
+        repo.log_many(rows)
 
     def export_to_file(self, filepath: str):
-        """导出到文件"""
+        """导出到文件（逐条序列化写入，不在内存中拼出完整列表）"""
         with self._lock:
-            events = [e.to_dict() for e in self._events]
+            events = list(self._events)
 
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(events, f, ensure_ascii=False, indent=2)
+            f.write("[")
+            for i, event in enumerate(events):
+                if i:
+                    f.write(",\n")
+                f.write(json.dumps(event.to_dict(), ensure_ascii=False))
+            f.write("]\n")
 
 
 # 全局审计日志器
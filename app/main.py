@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from pathlib import Path
 from typing import Optional, List
 from pydantic import BaseModel
@@ -15,7 +15,7 @@ from .tool_router import ToolAccessLevel as AccessLevel
 from .governance.metrics import get_metrics_collector
 from .governance.audit import get_audit_logger
 from .governance.alerts import get_alert_manager
-from .capture.recorder import get_recorder, ActionType, ElementSelector
+from .capture.recorder import get_recorder, ActionType, ElementSelector, SelectorType
 from .capture.generator import get_generator
 from .capture.refiner import get_refiner, RefineOptions
 
@@ -624,7 +624,7 @@ async def record_action(session_id: str, request: RecordActionRequest):
     if request.selector:
         selector = ElementSelector(
             selector=request.selector.get("selector", ""),
-            selector_type=request.selector.get("selector_type", "css"),
+            selector_type=SelectorType.parse(request.selector.get("selector_type", "css")),
             tag_name=request.selector.get("tag_name"),
             text_content=request.selector.get("text_content"),
             attributes=request.selector.get("attributes", {}),
@@ -660,7 +660,7 @@ async def get_recording(session_id: str):
     session = recorder.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Recording session not found")
-    return session.to_dict()
+    return Response(content=session.to_json(), media_type="application/json")
 
 
 @app.get("/api/capture/recordings")
@@ -1,11 +1,17 @@
 import re
 
+# 编号步骤行："1. xxx"
+STEP_NUMBER_PATTERN = re.compile(r'^\d+\.\s*')
+
 
 class StepParser:
     """
     步骤解析器 - 从Skill prompt中解析执行步骤
     """
 
+    # 步骤文本的前缀标记：该步骤与上一步属于同一批次，可并行执行
+    PARALLEL_MARKERS = ("[并行]", "[parallel]")
+
     def parse(self, prompt: str) -> list[str]:
         """从prompt中解析执行步骤"""
         lines = prompt.split('\n')
@@ -20,8 +26,50 @@ class StepParser:
             if in_steps_section and line.startswith('#'):
                 in_steps_section = False
                 continue
-            if in_steps_section and re.match(r'^\d+\.', line):
-                step_text = re.sub(r'^\d+\.\s*', '', line)
-                steps.append(step_text)
+            if in_steps_section:
+                number = STEP_NUMBER_PATTERN.match(line)
+                if number:
+                    steps.append(line[number.end():])
 
         return steps if steps else ["执行Skill指令"]
+
+    def parse_with_dependencies(self, prompt: str) -> list[tuple[str, set[int]]]:
+        """
+        解析步骤及其依赖
+
+        Returns:
+            [(步骤文本, 依赖的步骤下标集合), ...]
+            每一步依赖上一批次的全部步骤；未标记的步骤各自成为一个批次，
+            因此没有并行标记的 prompt 仍按原顺序逐步执行
+        """
+        parsed = []
+        prev_wave: set[int] = set()
+        wave: set[int] = set()
+
+        for i, step_text in enumerate(self.parse(prompt)):
+            marker = next((m for m in self.PARALLEL_MARKERS if step_text.startswith(m)), None)
+            if marker:
+                step_text = step_text[len(marker):].lstrip()
+            if not marker or not wave:
+                prev_wave, wave = wave, set()
+            wave.add(i)
+            parsed.append((step_text, set(prev_wave)))
+
+        return parsed
+
+    def parse_waves(self, prompt: str) -> list[tuple[set[int], list[tuple[int, str]]]]:
+        """
+        解析执行批次
+
+        依赖相同的连续步骤归为一个批次，批次内可并行、批次间按顺序执行
+
+        Returns:
+            [(依赖的步骤下标集合, [(步骤下标, 步骤文本), ...]), ...]
+        """
+        waves: list[tuple[set[int], list[tuple[int, str]]]] = []
+        for i, (step_text, deps) in enumerate(self.parse_with_dependencies(prompt)):
+            if waves and waves[-1][0] == deps:
+                waves[-1][1].append((i, step_text))
+            else:
+                waves.append((deps, [(i, step_text)]))
+        return waves
@@ -0,0 +1,72 @@
+"""
+Claude 响应缓存
+
+只缓存结果可以安全复用的 Skill 执行：
+- Skill 声明的工具全部是只读工具（read/glob/grep），会执行命令或写文件的 Skill 不缓存
+- 只做精确匹配：输入相近不代表读取的是同一个文件
+- 缓存键包含 Skill 内容哈希，SKILL.md 或内存 Skill 被修改后旧结果不再命中
+- 条目有 TTL，被读取的文件可能在此期间发生变化
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from .tools import READ_ONLY_TOOLS
+
+
+class ResponseCache:
+    """按 (skill_id, 内容哈希, 输入) 缓存 Claude 最终结果，LRU + TTL 淘汰"""
+
+    MAX_SIZE = 256
+    TTL_SECONDS = 300.0
+
+    def __init__(self, max_size: int = MAX_SIZE, ttl_seconds: float = TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # (skill_id, content_hash, args) → (写入时的单调时钟时间, 最终结果)
+        self._entries: "OrderedDict[tuple[str, str, str], tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_cacheable(allowed_tools: Optional[Iterable[str]]) -> bool:
+        """
+        Skill 的执行结果是否可以缓存
+
+        Args:
+            allowed_tools: Skill 允许的工具；None 或空表示允许所有工具
+        """
+        if not allowed_tools:
+            return False
+        return all(tool.lower() in READ_ONLY_TOOLS for tool in allowed_tools)
+
+    def get(self, skill_id: str, content_hash: str, args: Optional[str]) -> Optional[str]:
+        """查找缓存结果，过期条目视为未命中并移除"""
+        key = (skill_id, content_hash, args or "")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, skill_id: str, content_hash: str, args: Optional[str], final_result: str):
+        """缓存一次成功执行的结果"""
+        key = (skill_id, content_hash, args or "")
+        with self._lock:
+            self._entries[key] = (time.monotonic(), final_result)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, skill_id: str):
+        """丢弃某个 Skill 的所有缓存结果"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == skill_id]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
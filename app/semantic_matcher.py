@@ -3,6 +3,8 @@
 使用 embedding 实现用户输入与 Skill description 的语义匹配
 """
 import os
+import heapq
+import hashlib
 import numpy as np
 from typing import Optional
 from dataclasses import dataclass
@@ -36,8 +38,13 @@ class SemanticMatcher:
         """
         self.backend = backend
         self._client = None
+        # 以完整文本的内容摘要为键：描述一旦修改，旧 embedding 自然不再命中
         self._embeddings_cache: dict[str, np.ndarray] = {}
 
+        # 最近一次匹配用到的 Skill 文本 → 行归一化的 (N, D) 矩阵；Skill 集合不变时直接复用
+        self._desc_keys: tuple[str, ...] = ()
+        self._desc_matrix: Optional[np.ndarray] = None
+
         self._init_backend()
 
     def _init_backend(self):
@@ -67,28 +74,45 @@ class SemanticMatcher:
                 print("Warning: openai not installed, falling back to local")
                 self.backend = "local"
 
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        """embedding 缓存键（完整文本的 sha256 前 16 位）"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
     def _get_embedding(self, text: str) -> np.ndarray:
         """获取文本的 embedding 向量"""
-        # 检查缓存
-        cache_key = f"{self.backend}:{text[:100]}"
-        if cache_key in self._embeddings_cache:
-            return self._embeddings_cache[cache_key]
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[np.ndarray]:
+        """批量获取 embedding（未缓存的文本合并为一次后端调用）"""
+        keys = [self._cache_key(text) for text in texts]
+
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in self._embeddings_cache:
+                missing.setdefault(key, text)
 
+        if missing:
+            embeddings = self._compute_embeddings(list(missing.values()))
+            for key, embedding in zip(missing, embeddings):
+                self._embeddings_cache[key] = embedding
+
+        return [self._embeddings_cache[key] for key in keys]
+
+    def _compute_embeddings(self, texts: list[str]) -> list[np.ndarray]:
+        """调用后端生成 embedding"""
         if self.backend == "voyage":
-            result = self._client.embed([text], model="voyage-2")
-            embedding = np.array(result.embeddings[0])
+            result = self._client.embed(texts, model="voyage-2")
+            return [np.array(e) for e in result.embeddings]
         elif self.backend == "openai":
             result = self._client.embeddings.create(
-                input=text,
+                input=texts,
                 model="text-embedding-3-small"
             )
-            embedding = np.array(result.data[0].embedding)
+            return [np.array(e.embedding) for e in result.data]
         else:
             # 本地简单匹配：使用词袋模型 + TF-IDF 风格
-            embedding = self._local_embedding(text)
-
-        self._embeddings_cache[cache_key] = embedding
-        return embedding
+            return [self._local_embedding(text) for text in texts]
 
     def _local_embedding(self, text: str) -> np.ndarray:
         """
@@ -144,16 +168,15 @@ class SemanticMatcher:
 
         return vector
 
-    def _cosine_similarity(self, v1: np.ndarray, v2: np.ndarray) -> float:
-        """计算余弦相似度"""
-        dot = np.dot(v1, v2)
-        norm1 = np.linalg.norm(v1)
-        norm2 = np.linalg.norm(v2)
-
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-
-        return float(dot / (norm1 * norm2))
+    def _skill_matrix(self, texts: list[str]) -> np.ndarray:
+        """获取 Skill 文本的行归一化 embedding 矩阵（零向量保持为零）"""
+        keys = tuple(self._cache_key(text) for text in texts)
+        if keys != self._desc_keys or self._desc_matrix is None:
+            matrix = np.vstack(self.embed_batch(texts)).astype(np.float64)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._desc_matrix = matrix / np.where(norms > 0, norms, 1.0)
+            self._desc_keys = keys
+        return self._desc_matrix
 
     def match(
         self,
@@ -175,34 +198,39 @@ class SemanticMatcher:
         if not skills:
             return []
 
+        # 组合 name 和 description 进行匹配，一次矩阵-向量乘得到全部余弦相似度
+        matrix = self._skill_matrix([f"{name}: {description}" for name, description in skills])
         query_embedding = self._get_embedding(query)
+        norm = np.linalg.norm(query_embedding)
+        if norm == 0:
+            scores = np.zeros(len(skills))
+        else:
+            scores = matrix @ (query_embedding / norm)
+
+        # 按分数降序排列（同分保持输入顺序）
+        indices = np.flatnonzero(scores >= threshold)
+        indices = indices[np.argsort(-scores[indices], kind="stable")]
+
         results = []
+        for i in indices:
+            name, description = skills[i]
+            score = float(scores[i])
+
+            # 确定置信度级别
+            if score >= 0.7:
+                confidence = "high"
+            elif score >= 0.5:
+                confidence = "medium"
+            else:
+                confidence = "low"
+
+            results.append(MatchResult(
+                skill_name=name,
+                description=description,
+                score=score,
+                confidence=confidence
+            ))
 
-        for name, description in skills:
-            # 组合 name 和 description 进行匹配
-            skill_text = f"{name}: {description}"
-            skill_embedding = self._get_embedding(skill_text)
-
-            score = self._cosine_similarity(query_embedding, skill_embedding)
-
-            if score >= threshold:
-                # 确定置信度级别
-                if score >= 0.7:
-                    confidence = "high"
-                elif score >= 0.5:
-                    confidence = "medium"
-                else:
-                    confidence = "low"
-
-                results.append(MatchResult(
-                    skill_name=name,
-                    description=description,
-                    score=score,
-                    confidence=confidence
-                ))
-
-        # 按分数降序排列
-        results.sort(key=lambda x: x.score, reverse=True)
         return results
 
     def find_best_match(
@@ -228,6 +256,8 @@ class SemanticMatcher:
     def clear_cache(self):
         """清除 embedding 缓存"""
         self._embeddings_cache.clear()
+        self._desc_keys = ()
+        self._desc_matrix = None
 
 
 class KeywordMatcher:
@@ -256,41 +286,66 @@ class KeywordMatcher:
             "error": 1.5, "bug": 1.5,
         }
 
+        # 倒排索引：关键词 → 包含该词的 Skill 下标；Skill 列表变化时重建
+        self._index: dict[str, list[int]] = {}
+        self._indexed_skills: tuple[tuple[str, str], ...] = ()
+
     def extract_keywords(self, text: str) -> set[str]:
         """提取文本中的关键词"""
         words = text.lower().split()
         return set(w for w in words if w in self.keyword_weights)
 
+    def build_index(self, skills: list[tuple[str, str]]):
+        """为 Skill 列表建立关键词倒排索引"""
+        index: dict[str, list[int]] = {}
+        for i, (name, description) in enumerate(skills):
+            for keyword in self.extract_keywords(f"{name} {description}"):
+                index.setdefault(keyword, []).append(i)
+
+        self._index = index
+        self._indexed_skills = tuple(skills)
+
     def quick_match(
         self,
         query: str,
-        skills: list[tuple[str, str]]
+        skills: list[tuple[str, str]],
+        limit: Optional[int] = None
     ) -> list[tuple[str, str, float]]:
         """
         快速关键词匹配
 
+        Skill 描述只在列表变化时分词一次，查询时只需遍历查询关键词的倒排列表
+
+        Args:
+            limit: 最多返回的结果数，None 表示全部
+
         Returns:
             [(name, description, score), ...] 按分数降序
         """
         query_keywords = self.extract_keywords(query)
 
         if not query_keywords:
-            return [(name, desc, 0.1) for name, desc in skills]
-
-        results = []
-        for name, description in skills:
-            skill_text = f"{name} {description}"
-            skill_keywords = self.extract_keywords(skill_text)
-
-            # 计算交集的加权分数
-            common = query_keywords & skill_keywords
-            if common:
-                score = sum(self.keyword_weights.get(k, 1.0) for k in common)
-                score = score / (len(query_keywords) + 1)  # 归一化
-            else:
-                score = 0.0
-
-            results.append((name, description, score))
+            results = [(name, desc, 0.1) for name, desc in skills]
+            return results if limit is None else results[:limit]
+
+        skills = tuple(skills)
+        if skills != self._indexed_skills:
+            self.build_index(skills)
+
+        # 累加命中关键词的权重
+        scores = [0.0] * len(skills)
+        for keyword in query_keywords:
+            weight = self.keyword_weights.get(keyword, 1.0)
+            for i in self._index.get(keyword, ()):
+                scores[i] += weight
+
+        norm = len(query_keywords) + 1  # 归一化
+        results = [
+            (name, description, score / norm)
+            for (name, description), score in zip(skills, scores)
+        ]
 
-        results.sort(key=lambda x: x[2], reverse=True)
-        return results
+        if limit is None:
+            results.sort(key=lambda x: x[2], reverse=True)
+            return results
+        return heapq.nlargest(limit, results, key=lambda x: x[2])
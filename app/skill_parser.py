@@ -2,14 +2,27 @@
 SKILL.md 格式解析器
 支持 YAML frontmatter + Markdown 格式
 """
+import os
 import re
+import json
+import hashlib
+import threading
 import yaml
 from pathlib import Path
-from typing import Optional
-from dataclasses import dataclass, field
+from typing import Callable, Optional
+from dataclasses import asdict, dataclass, field
 
 
-@dataclass
+def skill_content_hash(name: str, description: str, content: str) -> str:
+    """Skill 可编辑字段（名称、描述、指令正文）的内容哈希"""
+    digest = hashlib.sha256()
+    for part in (name, description, content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass(slots=True)
 class SkillMetadata:
     """Level 1: 元数据（总是加载）"""
     name: str
@@ -18,21 +31,21 @@ class SkillMetadata:
     model: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class SkillInstructions:
     """Level 2: 指令内容（按需加载）"""
     content: str  # Markdown 内容
     sections: dict[str, str] = field(default_factory=dict)  # 分节内容
 
 
-@dataclass
+@dataclass(slots=True)
 class SkillResources:
     """Level 3: 资源文件（动态加载）"""
     files: dict[str, str] = field(default_factory=dict)  # 文件名 -> 内容
     scripts: list[str] = field(default_factory=list)  # 脚本路径列表
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedSkill:
     """完整解析的 Skill"""
     metadata: SkillMetadata
@@ -52,6 +65,15 @@ class ParsedSkill:
     def description(self) -> str:
         return self.metadata.description
 
+    @property
+    def content_hash(self) -> str:
+        """内容哈希，用于判断更新是否实际改变了 Skill"""
+        return skill_content_hash(
+            self.metadata.name,
+            self.metadata.description,
+            self.instructions.content if self.instructions else "",
+        )
+
 
 class SkillParser:
     """SKILL.md 文件解析器"""
@@ -188,51 +210,137 @@ class SkillLoader:
     Level 3: 资源 - 执行时按需加载参考文档和脚本
     """
 
+    # 元数据快照文件（位于 skills 目录下，扫描时只处理子目录，不会被当作 Skill）
+    METADATA_SNAPSHOT = ".metadata_cache.json"
+
     def __init__(self, skills_dir: Path):
         self.skills_dir = skills_dir
         self.parser = SkillParser()
         self._metadata_cache: dict[str, SkillMetadata] = {}
-        self._skills_cache: dict[str, ParsedSkill] = {}
+        # 名称 → (SKILL.md mtime, ParsedSkill)；文件修改后重新解析
+        self._skills_cache: dict[str, tuple[Optional[int], ParsedSkill]] = {}
+        # SKILL.md 路径 → (mtime, 元数据)；重新加载时跳过未修改的文件
+        self._file_meta: dict[Path, tuple[int, SkillMetadata]] = {}
+        self.snapshot_file = skills_dir / self.METADATA_SNAPSHOT
 
     def load_all_metadata(self) -> list[SkillMetadata]:
         """
         Level 1: 加载所有 Skill 的元数据
         这是最轻量的加载，只读取 YAML frontmatter
         """
-        self._metadata_cache.clear()
-
-        if not self.skills_dir.exists():
-            return []
-
-        for skill_dir in self.skills_dir.iterdir():
-            if skill_dir.is_dir():
+        metadata_cache: dict[str, SkillMetadata] = {}
+        file_meta: dict[Path, tuple[int, SkillMetadata]] = {}
+        changed = False
+
+        if self.skills_dir.exists():
+            for skill_dir in self.skills_dir.iterdir():
+                if not skill_dir.is_dir():
+                    continue
                 skill_md = skill_dir / "SKILL.md"
-                if skill_md.exists():
+                try:
+                    mtime = skill_md.stat().st_mtime_ns
+                except OSError:
+                    continue
+
+                cached = self._file_meta.get(skill_md)
+                if cached is not None and cached[0] == mtime:
+                    metadata = cached[1]
+                else:
                     try:
                         content = skill_md.read_text(encoding='utf-8')
                         metadata, _ = self.parser._parse_frontmatter(content)
-                        if metadata.name:
-                            self._metadata_cache[metadata.name] = metadata
                     except Exception as e:
                         print(f"Warning: Failed to load metadata from {skill_dir}: {e}")
+                        continue
+                    changed = True
+
+                file_meta[skill_md] = (mtime, metadata)
+                if metadata.name:
+                    metadata_cache[metadata.name] = metadata
+
+        changed = changed or len(file_meta) != len(self._file_meta)
+        self._metadata_cache = metadata_cache
+        self._file_meta = file_meta
+        if changed:
+            self._save_snapshot()
+        return list(metadata_cache.values())
+
+    def load_snapshot(self) -> bool:
+        """
+        从快照文件恢复上次扫描的元数据
+
+        Returns:
+            是否恢复了至少一个 Skill
+        """
+        try:
+            entries = json.loads(self.snapshot_file.read_text(encoding='utf-8'))
+            file_meta = {
+                Path(path): (mtime, SkillMetadata(**metadata))
+                for path, mtime, metadata in entries
+            }
+        except (OSError, ValueError, TypeError):
+            return False
+
+        self._file_meta = file_meta
+        self._metadata_cache = {
+            metadata.name: metadata
+            for _, metadata in file_meta.values()
+            if metadata.name
+        }
+        return bool(self._metadata_cache)
+
+    def _save_snapshot(self):
+        """保存元数据快照（写临时文件后原子替换）"""
+        entries = [
+            [str(path), mtime, asdict(metadata)]
+            for path, (mtime, metadata) in self._file_meta.items()
+        ]
+        # 临时文件名区分进程和线程，并发扫描不会互相覆盖写到一半的文件
+        tmp_file = self.snapshot_file.with_name(
+            f"{self.snapshot_file.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            tmp_file.write_text(json.dumps(entries, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_file, self.snapshot_file)
+        except OSError as e:
+            print(f"Warning: Failed to save metadata snapshot: {e}")
 
-        return list(self._metadata_cache.values())
+    def refresh_in_background(self, on_done: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """
+        后台重新扫描元数据（stale-while-revalidate）
+
+        扫描期间继续使用已有快照，完成后整体替换
+        """
+        def refresh():
+            self.load_all_metadata()
+            if on_done is not None:
+                on_done()
+
+        thread = threading.Thread(target=refresh, name="skill-metadata-refresh", daemon=True)
+        thread.start()
+        return thread
 
     def load_skill(self, skill_name: str) -> Optional[ParsedSkill]:
         """
         Level 2: 加载完整 Skill（元数据 + 指令）
         当 Skill 被触发时调用
         """
-        if skill_name in self._skills_cache:
-            return self._skills_cache[skill_name]
-
         skill_dir = self.skills_dir / skill_name
+        try:
+            mtime = (skill_dir / "SKILL.md").stat().st_mtime_ns
+        except OSError:
+            mtime = None
+
+        cached = self._skills_cache.get(skill_name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
         if not skill_dir.exists():
             return None
 
         try:
             skill = self.parser.parse_file(skill_dir)
-            self._skills_cache[skill_name] = skill
+            self._skills_cache[skill_name] = (mtime, skill)
             return skill
         except Exception as e:
             print(f"Warning: Failed to load skill {skill_name}: {e}")
@@ -254,6 +362,10 @@ class SkillLoader:
         """获取缓存的元数据"""
         return self._metadata_cache.get(skill_name)
 
+    def get_all_metadata(self) -> dict[str, SkillMetadata]:
+        """一次性获取所有缓存的元数据（名称 → 元数据）"""
+        return dict(self._metadata_cache)
+
     def list_skills(self) -> list[str]:
         """列出所有可用的 Skill 名称"""
         return list(self._metadata_cache.keys())
@@ -9,7 +9,7 @@ import os
 import uuid
 from datetime import datetime
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any, Generator
+from typing import TYPE_CHECKING, Optional, Dict, List, Any, Generator
 from pathlib import Path
 
 from .providers import get_provider, BaseLLMProvider, Message, ToolDefinition, ToolCall
@@ -19,7 +19,10 @@ from .governance.audit import get_audit_logger, AuditLogger
 from .governance.safety import get_safety_guard, SafetyGuard, SecurityContext
 from .governance.alerts import get_alert_manager, AlertManager
 from .capture.repository import get_repository, KnowledgeRepository, SkillEntry
-from .capture.vector_store import get_vector_store, SkillVectorStore
+from .capture import vector_store
+
+if TYPE_CHECKING:
+    from .capture.vector_store import SkillVectorStore
 
 
 @dataclass
@@ -127,7 +130,7 @@ class UnifiedSkillsEngine:
         self._safety: Optional[SafetyGuard] = None
         self._alerts: Optional[AlertManager] = None
         self._repository: Optional[KnowledgeRepository] = None
-        self._vector_store: Optional[SkillVectorStore] = None
+        self._vector_store: Optional["SkillVectorStore"] = None
 
         # Skills 目录
         self._skills_dir = Path(skills_dir) if skills_dir else Path(".claude/skills")
@@ -152,7 +155,8 @@ class UnifiedSkillsEngine:
         if self._repository is None:
             self._repository = get_repository(str(self._skills_dir))
         if self._vector_store is None:
-            self._vector_store = get_vector_store()
+            # 向量检索实现（含 NumPy）在这里才真正导入
+            self._vector_store = vector_store.get_vector_store()
 
     # ==================== Skill 管理 ====================
 
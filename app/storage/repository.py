@@ -8,7 +8,7 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import uuid
 
-from sqlalchemy import func, and_, or_, desc
+from sqlalchemy import func, and_, or_, desc, insert
 from sqlalchemy.orm import Session
 
 from .models import (
@@ -211,6 +211,15 @@ class AuditRepository(BaseRepository):
         self.session.flush()
         return log
 
+    def log_many(self, rows: List[Dict[str, Any]]) -> int:
+        """批量记录审计日志（一次 executemany 插入）"""
+        if not rows:
+            return 0
+        for row in rows:
+            row.setdefault("log_id", str(uuid.uuid4())[:16])
+        self.session.execute(insert(AuditLog), rows)
+        return len(rows)
+
     def get_by_session(self, session_id: str) -> List[AuditLog]:
         """获取会话的审计日志"""
         return self.session.query(AuditLog).filter(
@@ -5,8 +5,9 @@
 import os
 import subprocess
 import shlex
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 from dataclasses import dataclass
 from enum import Enum
 
@@ -131,6 +132,9 @@ TOOL_DEFINITIONS = [
     }
 ]
 
+# 不产生副作用、可以并行执行的工具
+READ_ONLY_TOOLS = frozenset({"read", "glob", "grep"})
+
 
 class ToolExecutor:
     """工具执行器"""
@@ -186,6 +190,37 @@ class ToolExecutor:
         result.duration_ms = (time.time() - start_time) * 1000
         return result
 
+    def execute_many(
+        self,
+        calls: list[tuple[str, dict[str, Any]]],
+        max_workers: int = 8
+    ) -> list[ToolResult]:
+        """
+        执行一组工具调用，结果与 calls 按顺序一一对应
+
+        连续的只读调用（read/glob/grep）并行执行；bash、write 等有副作用的调用
+        单独按顺序执行，并作为分隔点：它之前的调用全部完成后才开始，之后的调用等它完成
+        """
+        results: list[ToolResult] = []
+        batch: list[tuple[str, dict[str, Any]]] = []
+
+        def run_batch():
+            if len(batch) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(batch), max_workers)) as pool:
+                    results.extend(pool.map(lambda call: self.execute(*call), batch))
+            elif batch:
+                results.append(self.execute(*batch[0]))
+            batch.clear()
+
+        for tool_name, tool_input in calls:
+            if tool_name in READ_ONLY_TOOLS:
+                batch.append((tool_name, tool_input))
+            else:
+                run_batch()
+                results.append(self.execute(tool_name, tool_input))
+        run_batch()
+        return results
+
     def _execute_bash(self, params: dict) -> ToolResult:
         """执行 Bash 命令"""
         command = params.get("command", "")
@@ -344,14 +379,19 @@ class ToolExecutor:
             return ToolResult(success=False, output="", error=str(e))
 
 
+# 允许的工具集合（小写）→ 筛选后的工具定义
+_tool_defs_cache: dict[frozenset[str], list[dict]] = {}
+
+
 def get_tool_definitions(allowed_tools: list[str] = None) -> list[dict]:
-    """获取工具定义列表（用于 Claude API）"""
+    """获取工具定义列表（用于 Claude API），同一组允许工具只筛选一次"""
     if allowed_tools is None:
         return TOOL_DEFINITIONS
 
-    allowed_lower = [t.lower() for t in allowed_tools]
-    return [t for t in TOOL_DEFINITIONS if t["name"].lower() in allowed_lower]
-
+    key = frozenset(t.lower() for t in allowed_tools)
+    definitions = _tool_defs_cache.get(key)
+    if definitions is None:
+        definitions = [t for t in TOOL_DEFINITIONS if t["name"].lower() in key]
+        _tool_defs_cache[key] = definitions
+    return definitions
 
-# 补充 Optional 导入
-from typing import Optional
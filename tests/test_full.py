@@ -143,6 +143,39 @@ class TestSkills:
         assert response.status_code == 404
 
 
+# ==================== 步骤解析测试 ====================
+
+class TestStepParser:
+    PROMPT = (
+        "## 执行步骤\n"
+        "1. 查询库存\n"
+        "2. [并行] 查询价格\n"
+        "3. [parallel] 查询门店\n"
+        "4. 汇总结果\n"
+        "5. 通知店长\n"
+        "6. [并行] 记录日志\n"
+    )
+
+    def test_parallel_steps_share_a_wave(self):
+        """测试带并行标记的步骤与上一步归入同一批次，批次按顺序排列"""
+        from app.parser import StepParser
+
+        waves = StepParser().parse_waves(self.PROMPT)
+        assert [[i for i, _ in steps] for _, steps in waves] == [[0, 1, 2], [3], [4, 5]]
+        assert [deps for deps, _ in waves] == [set(), {0, 1, 2}, {3}]
+        assert [text for _, steps in waves for _, text in steps] == [
+            "查询库存", "查询价格", "查询门店", "汇总结果", "通知店长", "记录日志",
+        ]
+
+    def test_unmarked_steps_run_one_per_wave(self):
+        """测试没有并行标记的 prompt 每步单独一个批次，保持原顺序"""
+        from app.parser import StepParser
+
+        prompt = "## 执行步骤\n1. 第一步\n2. 第二步\n3. 第三步\n"
+        waves = StepParser().parse_waves(prompt)
+        assert [steps for _, steps in waves] == [[(0, "第一步")], [(1, "第二步")], [(2, "第三步")]]
+
+
 # ==================== Layer 3: Workflows 测试 ====================
 
 class TestWorkflows:
@@ -400,6 +433,578 @@ class TestSystemStatus:
         assert "skill_to_mcp_mapping" in data["mcp_integration"]
 
 
+# ==================== 知识沉淀: 录制与生成 ====================
+
+class TestCapture:
+    def _record_form_session(self, client):
+        """录制一个包含导航、表单填写和提交的会话"""
+        response = client.post("/api/capture/recording/start", json={
+            "name": "New Product Form",
+            "start_url": "https://pos.example.com/admin/products/new",
+        })
+        session_id = response.json()["session_id"]
+        page = "https://pos.example.com/admin/products/new"
+
+        actions = [
+            {"action_type": "navigate", "url": page, "page_url": page},
+            {"action_type": "wait_for_element", "selector": {"selector": "#form"}, "page_url": page},
+            {"action_type": "fill", "selector": {"selector": "#name"}, "value": "新品汉堡", "page_url": page},
+            {"action_type": "fill", "selector": {"selector": "#price"}, "value": "25.00", "page_url": page},
+            {"action_type": "select", "selector": {"selector": "#category"}, "value": "burger", "page_url": page},
+            {"action_type": "click", "selector": {"selector": "button[type=submit]"}, "page_url": page},
+        ]
+        for action in actions:
+            response = client.post(f"/api/capture/recording/{session_id}/action", json=action)
+            assert response.status_code == 200
+
+        client.post(f"/api/capture/recording/{session_id}/stop")
+        return session_id
+
+    def test_get_recording(self, client):
+        """测试获取录制详情"""
+        session_id = self._record_form_session(client)
+        response = client.get(f"/api/capture/recording/{session_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["session_id"] == session_id
+        assert data["status"] == "completed"
+        assert data["action_count"] == 6
+        assert data["actions"][2]["value"] == "新品汉堡"
+        assert len({a["action_id"] for a in data["actions"]}) == 6
+
+    def test_record_action_unknown_selector_type(self, client):
+        """测试未知选择器类型按 CSS 处理"""
+        response = client.post("/api/capture/recording/start", json={"name": "Selector Types"})
+        session_id = response.json()["session_id"]
+        response = client.post(f"/api/capture/recording/{session_id}/action", json={
+            "action_type": "click",
+            "selector": {"selector": "#save", "selector_type": "shadow"},
+        })
+        assert response.status_code == 200
+        assert response.json()["selector"]["selector_type"] == "css"
+        client.post(f"/api/capture/recording/{session_id}/stop")
+
+    def test_action_to_dict_is_cached(self):
+        """测试 to_dict 首次构造后复用同一个缓存字典"""
+        from datetime import datetime, timezone
+        from app.capture.recorder import ActionType, ElementSelector, RecordedAction
+
+        action = RecordedAction(
+            action_id="a1",
+            action_type=ActionType.CLICK,
+            timestamp=datetime.now(timezone.utc),
+            selector=ElementSelector(selector="#save"),
+        )
+        data = action.to_dict()
+        assert action.to_dict() is data
+        assert data["action_type"] == "click"
+        assert data["selector"]["selector"] == "#save"
+
+    @pytest.mark.parametrize("aware", [True, False])
+    def test_recording_duration_with_start_time(self, aware):
+        """测试传入带时区或 naive 的历史 start_time 时，会话可创建且时长从 start_time 起算"""
+        from datetime import datetime, timedelta, timezone
+        from app.capture.recorder import RecordingSession
+
+        now = datetime.now(timezone.utc) if aware else datetime.utcnow()
+        session = RecordingSession(session_id="tz", start_time=now - timedelta(seconds=5))
+        assert 5000 <= session.duration_ms < 60000
+        session.complete()
+        assert (session.end_time.tzinfo is None) is not aware
+        assert 5000 <= session.duration_ms < 60000
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_recording_to_json(self, client, monkeypatch, use_orjson):
+        """测试录制会话直接序列化 dataclass 字段，orjson 与标准库输出一致"""
+        import json
+        from app.capture import recorder
+
+        if not use_orjson:
+            monkeypatch.setattr(recorder, "orjson", None)
+        elif recorder.orjson is None:
+            pytest.skip("orjson not installed")
+
+        session_id = self._record_form_session(client)
+        data = json.loads(recorder.get_recorder().get_session(session_id).to_json())
+        assert data["session_id"] == session_id
+        assert data["action_count"] == 6
+        assert data["duration_ms"] >= 0
+        assert [a["action_type"] for a in data["actions"]][:2] == ["navigate", "wait_for_element"]
+        assert data["actions"][2]["selector"]["selector"] == "#name"
+        assert data["start_time"].endswith("+00:00")
+        assert not any(k.startswith("_") for k in data)
+        assert not any(k.startswith("_") for k in data["actions"][2])
+        assert not any(k.startswith("_") for k in data["actions"][2]["selector"])
+
+    def test_generate_skill_from_recording(self, client):
+        """测试从录制生成 Skill"""
+        session_id = self._record_form_session(client)
+        response = client.post("/api/capture/generate", json={"session_id": session_id})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["name"] == "new-product-form"
+        assert data["content"].startswith("---\nname: new-product-form\n")
+        assert {p["name"] for p in data["parameters"]} >= {"name", "price"}
+
+    def test_generate_merges_consecutive_actions(self, client):
+        """测试导航+等待、连续表单填写合并为单行操作"""
+        session_id = self._record_form_session(client)
+        response = client.post("/api/capture/generate", json={"session_id": session_id})
+        steps = response.json()["steps"]
+        assert len(steps) == 1
+        actions = steps[0]["actions"]
+        assert len(actions) == 3
+        assert actions[0].startswith("1. 导航到") and "等待 #form 出现" in actions[0]
+        assert "#name" in actions[1] and "#price" in actions[1] and "#category" in actions[1]
+        assert actions[2].startswith("3. 点击")
+
+    @pytest.mark.parametrize("value, param_name", [
+        ("25.00", "price"),
+        ("SKU-001", "price"),
+        ("SKU-ABC", "sku"),
+        ("user1@x.com", "price"),
+        ("user@x.com", "email"),
+        ("张三 123", "price"),
+        ("张三", "name"),
+        ("1700000000", "price"),
+    ])
+    def test_extract_parameters_pattern_priority(self, value, param_name):
+        """测试值同时匹配多个参数模式时按 PARAM_PATTERNS 的声明顺序归类"""
+        from datetime import datetime, timezone
+        from app.capture.generator import get_generator
+        from app.capture.recorder import ActionType, ElementSelector, RecordedAction
+
+        action = RecordedAction(
+            action_id="a1",
+            action_type=ActionType.FILL,
+            timestamp=datetime.now(timezone.utc),
+            selector=ElementSelector(selector="#field"),
+            value=value,
+        )
+        params = get_generator()._extract_parameters([action])
+        assert [p.name for p in params] == [param_name]
+
+    @pytest.mark.parametrize("selector, expected", [
+        ({"selector": "button[type=submit]"}, True),
+        ({"selector": "button.primary", "text_content": "Submit"}, True),
+        ({"selector": "button.primary", "attributes": {"class": "btn-submit"}}, True),
+        ({"selector": "#save", "fallback_selectors": ["button[type=submit]"]}, True),
+        ({"selector": "#save", "attributes": {"type": "submit"}}, True),
+        ({"selector": "#save", "tag_name": "button", "text_content": "Save"}, False),
+    ])
+    def test_is_submit_checks_all_selector_text(self, selector, expected):
+        """测试提交按钮识别覆盖选择器的全部文本字段（与旧版基于 repr 的判断一致）"""
+        from app.capture.generator import _is_submit
+        from app.capture.recorder import ElementSelector
+
+        element = ElementSelector(**selector)
+        assert _is_submit(element) is expected
+        assert ("submit" in str(element).lower()) is expected
+
+    def test_refine_parameterizes_hardcoded_values(self, client):
+        """测试优化器将硬编码值替换为参数引用且保留序号"""
+        from app.capture.generator import get_generator
+        from app.capture.recorder import get_recorder
+        from app.capture.refiner import get_refiner
+
+        session_id = self._record_form_session(client)
+        skill = get_generator().generate(get_recorder().get_session(session_id))
+        result = get_refiner().refine(skill)
+
+        actions = skill.steps[0].actions
+        assert [a.split(". ", 1)[0] for a in actions] == ["1", "2", "3"]
+        assert "导航到 ${url}" in actions[0]
+        assert "'${price}'" in actions[1]
+        assert "25.00" not in actions[1]
+        assert "添加参数: url" in result.changes_made
+        assert list(get_refiner().validate(skill)) == []
+
+    def test_repository_stats_replayed_from_wal(self, tmp_path):
+        """测试执行统计写入增量日志并在重新加载时回放"""
+        from app.capture.repository import KnowledgeRepository
+
+        skill_dir = tmp_path / "demo-skill"
+        skill_dir.mkdir()
+        (skill_dir / "SKILL.md").write_text("---\nname: demo-skill\ndescription: demo\n---\n", encoding="utf-8")
+
+        repo = KnowledgeRepository(str(tmp_path))
+        repo.update_stats("demo-skill", True, 100)
+        repo.update_stats("demo-skill", False, 200)
+        repo._flush_if_dirty()
+        assert not (tmp_path / "index.json").exists()
+
+        entry = KnowledgeRepository(str(tmp_path)).get_skill("demo-skill")
+        assert entry.execution_count == 2
+        assert entry.avg_duration_ms == 110
+
+        repo.compact()
+        assert (tmp_path / "index.wal").read_bytes() == b""
+        assert KnowledgeRepository(str(tmp_path)).get_skill("demo-skill").execution_count == 2
+
+    def test_repository_skips_wal_already_in_index(self, tmp_path, monkeypatch):
+        """测试保存索引后、清空日志前中断时，重新加载不会重复回放日志"""
+        from app.capture.repository import KnowledgeRepository
+
+        skill_dir = tmp_path / "demo-skill"
+        skill_dir.mkdir()
+        (skill_dir / "SKILL.md").write_text("---\nname: demo-skill\ndescription: demo\n---\n", encoding="utf-8")
+
+        repo = KnowledgeRepository(str(tmp_path))
+        repo.update_stats("demo-skill", True, 100)
+        repo._flush_if_dirty()
+
+        def crash():
+            raise OSError("simulated crash")
+
+        monkeypatch.setattr(repo, "_reset_wal", crash)
+        with pytest.raises(OSError):
+            repo.compact()
+        assert (tmp_path / "index.wal").read_bytes() != b""
+
+        reloaded = KnowledgeRepository(str(tmp_path))
+        assert reloaded.get_skill("demo-skill").execution_count == 1
+        assert (tmp_path / "index.wal").read_bytes() == b""
+
+        reloaded.update_stats("demo-skill", True, 100)
+        reloaded._flush_if_dirty()
+        assert KnowledgeRepository(str(tmp_path)).get_skill("demo-skill").execution_count == 2
+
+    def test_vector_store_import_is_lazy(self):
+        """测试导入向量存储模块不会加载 numpy，访问其中的名称时才加载"""
+        import subprocess
+        import sys
+        from pathlib import Path
+
+        code = (
+            "import sys\n"
+            "import app.capture.vector_store as vs\n"
+            "assert 'numpy' not in sys.modules\n"
+            "vs.VectorStore\n"
+            "assert 'numpy' in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).resolve().parents[1])
+
+    @pytest.mark.parametrize("crash_before", ["index", "vectors"])
+    def test_vector_store_survives_crash_during_compaction(self, tmp_path, monkeypatch, crash_before):
+        """测试压缩保存在替换索引或向量文件前中断时，重新加载后行号与向量仍然对应"""
+        import os
+        from app.capture._vector_store_impl import VectorStore, _open_stores
+
+        texts = [f"entry {i} about topic {chr(ord('a') + i) * 5}" for i in range(5)]
+        store = VectorStore(str(tmp_path), embedding_backend="local")
+        _open_stores.discard(store)
+        for i, text in enumerate(texts):
+            store.add(text, entry_id=f"e{i}")
+        store.delete("e0")
+        store.delete("e3")
+
+        target = store.index_file if crash_before == "index" else store.vectors_file
+        real_replace = os.replace
+
+        def crashing_replace(src, dst):
+            if os.fspath(dst) == os.fspath(target):
+                raise OSError("simulated crash")
+            real_replace(src, dst)
+
+        monkeypatch.setattr(os, "replace", crashing_replace)
+        with pytest.raises(OSError):
+            store.delete("e4")  # 墓碑过半，触发压缩保存
+        monkeypatch.setattr(os, "replace", real_replace)
+
+        reloaded = VectorStore(str(tmp_path), embedding_backend="local")
+        _open_stores.discard(reloaded)
+        assert set(reloaded._entries) == {"e1", "e2"}
+        for entry_id in ("e1", "e2"):
+            top = reloaded.search(texts[int(entry_id[1])], top_k=1)[0]
+            assert top.entry_id == entry_id
+            assert top.score == pytest.approx(1.0, abs=1e-4)
+        assert not list(tmp_path.glob("vectors.*.pending.npy"))
+
+    def test_stores_collectable_and_exit_tolerates_removed_dirs(self):
+        """测试存储实例可被回收，且目录已删除时退出不报错"""
+        import subprocess
+        import sys
+        from pathlib import Path
+
+        code = (
+            "import gc, shutil, sys, tempfile, weakref\n"
+            "from app.capture._vector_store_impl import VectorStore\n"
+            "from app.capture.repository import KnowledgeRepository\n"
+            "store = VectorStore(tempfile.mkdtemp(), embedding_backend='local')\n"
+            "ref = weakref.ref(store)\n"
+            "del store\n"
+            "gc.collect()\n"
+            "assert ref() is None\n"
+            "base = tempfile.mkdtemp()\n"
+            "store = VectorStore(base, embedding_backend='local')\n"
+            "store.add('hello world', entry_id='e1')\n"
+            "repo = KnowledgeRepository(tempfile.mkdtemp())\n"
+            "repo.update_stats('missing', True, 1)\n"
+            "shutil.rmtree(base)\n"
+            "shutil.rmtree(repo.base_dir)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, cwd=Path(__file__).resolve().parents[1],
+        )
+        assert result.returncode == 0, result.stderr
+        assert "Exception ignored" not in result.stderr
+
+    def test_numba_search_kernel_skips_tombstones(self):
+        """测试 numba 检索内核过滤已删除的行和低于阈值的行"""
+        pytest.importorskip("numba")
+        import numpy as np
+        from app.capture._vector_store_impl import _search_kernel
+
+        vectors = np.array([[1, 0], [0.8, 0.6], [1, 0], [0, 1]], dtype=np.float32)
+        query = np.array([1, 0], dtype=np.float32)
+        alive = np.array([True, True, False, True])
+
+        indices, scores = _search_kernel(query, vectors, alive, np.float32(0.5))
+        assert indices.tolist() == [0, 1]
+        assert np.allclose(scores, [1.0, 0.8])
+
+        indices, _ = _search_kernel(query, vectors, alive, np.float32(-np.inf))
+        assert indices.tolist() == [0, 1, 3]
+
+
+# ==================== Claude 引擎组件测试 ====================
+
+class TestClaudeEngineComponents:
+    def test_response_cache_only_for_read_only_skills(self):
+        """测试只有只读工具的 Skill 才缓存响应"""
+        from app.response_cache import ResponseCache
+
+        assert ResponseCache.is_cacheable(["Read", "Grep"])
+        assert not ResponseCache.is_cacheable(["read", "bash"])
+        assert not ResponseCache.is_cacheable(["write"])
+        assert not ResponseCache.is_cacheable(None)
+        assert not ResponseCache.is_cacheable([])
+
+    def test_response_cache_hit_and_miss(self):
+        """测试响应缓存只在 Skill 内容和输入完全相同时命中"""
+        from app.response_cache import ResponseCache
+
+        cache = ResponseCache()
+        cache.put("file-reader", "hash-1", "read a.txt", "contents of a")
+
+        assert cache.get("file-reader", "hash-1", "read a.txt") == "contents of a"
+        assert cache.get("file-reader", "hash-1", "read b.txt") is None
+        assert cache.get("file-reader", "hash-2", "read a.txt") is None
+        assert cache.get("other-skill", "hash-1", "read a.txt") is None
+
+    def test_response_cache_invalidation(self):
+        """测试响应缓存按 Skill 失效、过期失效"""
+        from app.response_cache import ResponseCache
+
+        cache = ResponseCache()
+        cache.put("file-reader", "hash-1", "read a.txt", "contents of a")
+        cache.put("git-reader", "hash-1", "log", "history")
+        cache.invalidate("file-reader")
+        assert cache.get("file-reader", "hash-1", "read a.txt") is None
+        assert cache.get("git-reader", "hash-1", "log") == "history"
+
+        expired = ResponseCache(ttl_seconds=0)
+        expired.put("file-reader", "hash-1", "read a.txt", "contents of a")
+        assert expired.get("file-reader", "hash-1", "read a.txt") is None
+        assert len(expired) == 0
+
+    def test_skill_content_hash_tracks_edits_on_disk(self, tmp_path):
+        """测试修改 SKILL.md 后重新加载，内容哈希随之变化"""
+        import os
+        from app.skill_parser import SkillLoader
+
+        skill_md = tmp_path / "file-reader" / "SKILL.md"
+        skill_md.parent.mkdir()
+        skill_md.write_text("---\nname: file-reader\ndescription: read\n---\n\nRead files.", encoding="utf-8")
+
+        loader = SkillLoader(tmp_path)
+        before = loader.load_skill("file-reader").content_hash
+        assert loader.load_skill("file-reader").content_hash == before
+
+        skill_md.write_text("---\nname: file-reader\ndescription: read\n---\n\nRead files twice.", encoding="utf-8")
+        stat = skill_md.stat()
+        os.utime(skill_md, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert loader.load_skill("file-reader").content_hash != before
+
+    def test_concurrent_metadata_scans_keep_snapshot_valid(self, tmp_path):
+        """测试并发扫描元数据时快照文件完整，且不残留临时文件"""
+        import threading
+        from app.skill_parser import SkillLoader
+
+        for i in range(5):
+            skill_md = tmp_path / f"skill-{i}" / "SKILL.md"
+            skill_md.parent.mkdir()
+            skill_md.write_text(f"---\nname: skill-{i}\ndescription: demo\n---\n\nBody.", encoding="utf-8")
+
+        loaders = [SkillLoader(tmp_path) for _ in range(8)]
+        threads = [threading.Thread(target=loader.load_all_metadata) for loader in loaders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        restored = SkillLoader(tmp_path)
+        assert restored.load_snapshot()
+        assert sorted(restored.list_skills()) == [f"skill-{i}" for i in range(5)]
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_tool_calls_keep_order_and_serialize_writes(self, tmp_path):
+        """测试只读调用并行、写入顺序执行，结果与调用顺序一致"""
+        import threading
+        import time
+        from app.tools import ToolExecutor
+
+        class TrackingExecutor(ToolExecutor):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.active_writes = 0
+                self.max_active_writes = 0
+                self._counter_lock = threading.Lock()
+
+            def _execute_write(self, params):
+                with self._counter_lock:
+                    self.active_writes += 1
+                    self.max_active_writes = max(self.max_active_writes, self.active_writes)
+                time.sleep(0.05)
+                try:
+                    return super()._execute_write(params)
+                finally:
+                    with self._counter_lock:
+                        self.active_writes -= 1
+
+        executor = TrackingExecutor(working_dir=str(tmp_path))
+        results = executor.execute_many([
+            ("write", {"file_path": "a.txt", "content": "1"}),
+            ("write", {"file_path": "a.txt", "content": "2"}),
+            ("read", {"file_path": "a.txt"}),
+            ("glob", {"pattern": "*.txt"}),
+            ("write", {"file_path": "a.txt", "content": "3"}),
+            ("read", {"file_path": "a.txt"}),
+        ])
+
+        assert [r.tool_name for r in results] == ["write", "write", "read", "glob", "write", "read"]
+        assert all(r.success for r in results)
+        # 每次读取都能看到它之前的写入
+        assert results[2].output == "2"
+        assert results[5].output == "3"
+        assert executor.max_active_writes == 1
+
+
+# ==================== 治理: 审计与告警 ====================
+
+class TestGovernance:
+    def test_audit_logger_rejects_empty_buffer(self):
+        """测试审计缓冲区容量至少为 1"""
+        from app.governance.audit import AuditLogger
+
+        with pytest.raises(ValueError):
+            AuditLogger(max_events=0)
+
+    def test_audit_handlers_run_after_flush(self):
+        """测试审计处理器在后台线程中按记录顺序执行，flush_handlers 后全部完成"""
+        import threading
+        from app.governance.audit import AuditEventType, AuditLogger
+
+        audit = AuditLogger()
+        seen = []
+        audit.add_handler(lambda event: seen.append((event, threading.current_thread())))
+        audit.add_handler(lambda event: 1 / 0)  # 处理器出错不影响其他处理器
+
+        events = [audit.log(AuditEventType.SKILL_CREATED, f"create demo {i}") for i in range(3)]
+        audit.flush_handlers()
+        assert [event for event, _ in seen] == events
+        assert all(thread is not threading.current_thread() for _, thread in seen)
+
+    def test_audit_indexes_match_full_scan_after_wrap(self):
+        """测试缓冲区回绕淘汰旧事件后，按索引查询与全量扫描结果一致"""
+        from app.governance.audit import AuditEventType, AuditLogger
+
+        audit = AuditLogger(max_events=7)
+        types = [AuditEventType.TOOL_CALL, AuditEventType.SKILL_CREATED, AuditEventType.EXECUTION_START]
+        for i in range(25):
+            audit.log(
+                types[i % 3],
+                f"action {i}",
+                session_id=f"s{i % 2}",
+                execution_id=f"e{i % 4}" if i % 5 else None,
+                user_id=f"u{i % 3}",
+            )
+        assert len(audit._events) == 7
+
+        def scan(**filters):
+            events = [e for e in audit._events if all(getattr(e, k) == v for k, v in filters.items())]
+            return sorted(events, key=lambda e: e.timestamp, reverse=True)
+
+        queries = [
+            {"event_type": AuditEventType.TOOL_CALL},
+            {"event_category": audit.EVENT_CATEGORY_MAP[AuditEventType.SKILL_CREATED]},
+            {"session_id": "s1"},
+            {"execution_id": "e2"},
+            {"user_id": "u0"},
+            {"session_id": "s0", "user_id": "u1"},
+            {"execution_id": "e0"},  # 大部分 e0 事件已被淘汰
+        ]
+        for filters in queries:
+            assert audit.get_events(**filters) == scan(**filters)
+        assert audit.get_events(session_id="missing") == []
+
+        # 索引中不残留已淘汰的事件
+        live = {e.event_id for e in audit._events}
+        for index in (audit._by_type, audit._by_category, audit._by_session, audit._by_execution, audit._by_user):
+            assert all(e.event_id in live for bucket in index.values() for e in bucket)
+
+    def test_alert_lifecycle_updates_active_alerts(self):
+        """测试确认、解决、静默后告警离开活跃列表，自动恢复同样生效"""
+        from app.governance.alerts import AlertLevel, AlertManager, AlertRule, AlertStatus
+
+        manager = AlertManager()
+        manager.check_and_trigger("success_rate", "system", 0.5, sample_count=10)
+        manager.check_and_trigger("duration", "system", 6000, sample_count=10)
+        active = manager.get_active_alerts()
+        assert {a.rule_id for a in active} == {"success_rate_low", "success_rate_critical", "high_latency"}
+
+        by_rule = {a.rule_id: a for a in active}
+        assert manager.acknowledge(by_rule["success_rate_low"].alert_id, "ops")
+        assert manager.resolve(by_rule["success_rate_critical"].alert_id)
+        assert manager.silence(by_rule["high_latency"].alert_id)
+        assert manager.get_active_alerts() == []
+        assert not manager.acknowledge("missing", "ops")
+
+        statuses = {a.rule_id: a.status for a in manager.get_all_alerts()}
+        assert statuses == {
+            "success_rate_low": AlertStatus.ACKNOWLEDGED,
+            "success_rate_critical": AlertStatus.RESOLVED,
+            "high_latency": AlertStatus.SILENCED,
+        }
+
+        # 自定义规则无冷却：触发后指标恢复即自动解决
+        manager.add_rule(AlertRule(
+            rule_id="queue_depth", name="队列积压", description="队列长度超过 100",
+            level=AlertLevel.INFO, metric_type="queue_depth", metric_scope="system",
+            threshold=100, operator="gt", cooldown_minutes=0,
+        ))
+        manager.check_and_trigger("queue_depth", "system", 150)
+        assert [a.rule_id for a in manager.get_active_alerts()] == ["queue_depth"]
+        manager.check_and_trigger("queue_depth", "system", 10)
+        assert manager.get_active_alerts() == []
+
+    def test_alert_handlers_run_after_flush(self):
+        """测试告警处理器在后台执行，flush_notifications 后全部完成"""
+        import threading
+        from app.governance.alerts import AlertManager
+
+        manager = AlertManager()
+        seen = []
+        manager.add_handler(lambda alert: seen.append((alert.rule_id, threading.current_thread())))
+        manager.add_handler(lambda alert: 1 / 0)  # 处理器出错不影响其他处理器
+
+        manager.check_and_trigger("success_rate", "system", 0.5, sample_count=10)
+        manager.flush_notifications()
+        assert sorted(rule_id for rule_id, _ in seen) == ["success_rate_critical", "success_rate_low"]
+        assert all(thread is not threading.current_thread() for _, thread in seen)
+
+
 # ==================== 边缘情况测试 ====================
 
 class TestEdgeCases: